@@ -0,0 +1,141 @@
+"""
+Admission control for API routes
+
+Each limited route gets its own pool of concurrent slots and a bounded wait
+queue. When both are full the request is shed with a 503 and a Retry-After
+header instead of piling up on workers and database connections. Because every
+route has its own pool, a burst on an expensive route cannot use up the
+capacity reserved for cheap ones.
+"""
+
+import threading
+import time
+
+from flask import g, jsonify, request
+
+
+class AdmissionLimiter:
+    def __init__(self, name, max_concurrent, max_queue=0, queue_timeout=5.0, retry_after=2):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._cond = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+
+    def acquire(self):
+        """Take a slot, waiting in the queue if needed. Returns False when shed."""
+        with self._cond:
+            if self.active < self.max_concurrent and self.waiting == 0:
+                self.active += 1
+                self.admitted += 1
+                return True
+
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                return False
+
+            self.waiting += 1
+            self.queued += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'shed': self.shed
+            }
+
+
+class AdmissionController:
+    """
+    Per-route limits for one app. Limits are configured per blueprint with
+    limit_blueprint(); init_app() installs a single app-level hook pair that
+    finds the limiter from request.blueprint, so the module-level blueprints
+    themselves are never modified and any number of apps can be created.
+    """
+
+    def __init__(self):
+        self.limiters = {}
+        self.blueprints = {}
+
+    def limit_blueprint(self, blueprint, max_concurrent, max_queue=0, queue_timeout=5.0,
+                        retry_after=2, routes=None):
+        """
+        Set per-route limits for every endpoint of a blueprint.
+
+        The blueprint-level settings apply to each route separately; `routes`
+        maps a view function name to overrides for that route, e.g.
+        {'get_trends': {'max_concurrent': 2}}.
+        """
+        defaults = {
+            'max_concurrent': max_concurrent,
+            'max_queue': max_queue,
+            'queue_timeout': queue_timeout,
+            'retry_after': retry_after
+        }
+        self.blueprints[blueprint.name] = (defaults, routes or {})
+
+    def init_app(self, app):
+        app.before_request(self.admit)
+        app.teardown_request(self.release)
+
+    def get_limiter(self, blueprint, endpoint):
+        """The limiter for an endpoint, or None if its blueprint is not limited"""
+        if endpoint is None or blueprint not in self.blueprints:
+            return None
+        limiter = self.limiters.get(endpoint)
+        if limiter is None:
+            defaults, overrides = self.blueprints[blueprint]
+            view_name = endpoint.rsplit('.', 1)[-1]
+            settings = dict(defaults, **overrides.get(view_name, {}))
+            limiter = self.limiters.setdefault(endpoint, AdmissionLimiter(endpoint, **settings))
+        return limiter
+
+    def admit(self):
+        limiter = self.get_limiter(request.blueprint, request.endpoint)
+        if limiter is None:
+            return None
+        if not limiter.acquire():
+            response = jsonify({'error': 'Server busy, retry later'})
+            response.status_code = 503
+            response.headers['Retry-After'] = str(limiter.retry_after)
+            return response
+        g.admission_limiter = limiter
+
+    def release(self, exc=None):
+        limiter = g.pop('admission_limiter', None)
+        if limiter is not None:
+            limiter.release()
+
+    def stats(self):
+        return {endpoint: limiter.stats() for endpoint, limiter in sorted(self.limiters.items())}
@@ -1,12 +1,47 @@
 from flask import Flask
 from flask_cors import CORS
 from routes import listings_bp, analytics_bp
+from admission import AdmissionController
+from catalog import model_catalog
+from warming import cache_warmer
 import os
 
+# Per-blueprint admission limits, applied to each route separately.
+# The analytics aggregations are the expensive ones, so they get a small pool
+# and short queue; cheap catalog/listing routes keep their own capacity.
+ADMISSION_LIMITS = {
+    'listings': {
+        'blueprint': listings_bp,
+        'max_concurrent': int(os.getenv('LISTINGS_MAX_CONCURRENT', 8)),
+        'max_queue': int(os.getenv('LISTINGS_MAX_QUEUE', 32)),
+        'queue_timeout': 5.0,
+        'retry_after': 1
+    },
+    'analytics': {
+        'blueprint': analytics_bp,
+        'max_concurrent': int(os.getenv('ANALYTICS_MAX_CONCURRENT', 2)),
+        'max_queue': int(os.getenv('ANALYTICS_MAX_QUEUE', 4)),
+        'queue_timeout': 10.0,
+        'retry_after': 5,
+        'routes': {
+            'get_stats': {'max_concurrent': 4, 'max_queue': 8}
+        }
+    }
+}
+
 def create_app():
     app = Flask(__name__)
     CORS(app)
     
+    admission = AdmissionController()
+    for limits in ADMISSION_LIMITS.values():
+        limits = dict(limits)
+        admission.limit_blueprint(limits.pop('blueprint'), **limits)
+    admission.init_app(app)
+    
+    model_catalog.start()
+    cache_warmer.init_app(app)
+    
     app.register_blueprint(listings_bp)
     app.register_blueprint(analytics_bp)
     
@@ -14,6 +49,10 @@ def create_app():
     def health():
         return {'status': 'ok'}
     
+    @app.route('/health/admission')
+    def admission_stats():
+        return admission.stats()
+    
     return app
 
 if __name__ == '__main__':
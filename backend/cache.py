@@ -0,0 +1,69 @@
+"""
+In-process response cache for the per-model API routes
+
+Entries are keyed by (route, model_id, ...) with an integer model_id of a
+model in the catalog, expire after a TTL as a safety net, and are evicted
+least recently used first beyond max_entries; the cache warmer invalidates and
+recomputes a model's entries as soon as an ingest for that model finishes.
+Request counts per model are tracked here so the warmer can refresh the most
+popular models first.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class ResponseCache:
+    def __init__(self, ttl=1800, popularity_window=3600, max_entries=2048):
+        self.ttl = ttl
+        self.popularity_window = popularity_window
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._requests = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                self._entries.pop(key, None)
+                return None
+            self._entries.move_to_end(key)
+            return value
+    
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate_model(self, model_id):
+        model_id = int(model_id)
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == model_id]:
+                self._entries.pop(key, None)
+    
+    def record_request(self, model_id):
+        if model_id is None:
+            return
+        with self._lock:
+            hits = self._requests.setdefault(int(model_id), deque(maxlen=10000))
+            hits.append(time.monotonic())
+    
+    def popularity(self, model_id):
+        cutoff = time.monotonic() - self.popularity_window
+        with self._lock:
+            hits = self._requests.get(int(model_id))
+            if not hits:
+                return 0
+            while hits and hits[0] < cutoff:
+                hits.popleft()
+            return len(hits)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,159 @@
+"""
+In-process catalog of makes, models and variants
+
+The catalog only changes when populate_db.py adds a new car, so it is loaded
+once at startup and kept in memory. A background thread polls a cheap version
+query and reloads when the tables change or the TTL expires. Routes use it for
+/api/models and for O(1) id -> name lookups instead of joining the dimension
+tables on every request.
+"""
+
+import threading
+import time
+
+from database import execute_query
+
+VERSION_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM makes) AS makes_count,
+        (SELECT COALESCE(MAX(id), 0) FROM makes) AS makes_max_id,
+        (SELECT COUNT(*) FROM models) AS models_count,
+        (SELECT COALESCE(MAX(id), 0) FROM models) AS models_max_id,
+        (SELECT COUNT(*) FROM variants) AS variants_count,
+        (SELECT COALESCE(MAX(id), 0) FROM variants) AS variants_max_id
+"""
+
+
+class CatalogSnapshot:
+    def __init__(self, version, makes, models, variants):
+        self.version = version
+        self.makes = makes
+        self.models = models
+        self.variants = variants
+        self.loaded_at = time.monotonic()
+
+        self.model_list = sorted(
+            (
+                {'id': model_id, 'name': model['name'], 'make_name': makes.get(model['make_id'])}
+                for model_id, model in models.items()
+                if model['make_id'] in makes
+            ),
+            key=lambda m: (m['make_name'] or '', m['name'])
+        )
+
+
+class ModelCatalog:
+    def __init__(self, ttl=3600, poll_interval=30, miss_reload_interval=5):
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.miss_reload_interval = miss_reload_interval
+        self._snapshot = None
+        self._load_lock = threading.Lock()
+        self._miss_reload_at = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _fetch_version(self):
+        row = execute_query(VERSION_QUERY, fetch_one=True)
+        return tuple(row.values())
+
+    def load(self):
+        """Load the whole catalog and swap it in atomically"""
+        with self._load_lock:
+            return self._load_locked()
+
+    def _load_locked(self):
+        version = self._fetch_version()
+        makes = {row['id']: row['name'] for row in execute_query("SELECT id, name FROM makes")}
+        models = {
+            row['id']: {'name': row['name'], 'make_id': row['make_id']}
+            for row in execute_query("SELECT id, make_id, name FROM models")
+        }
+        variants = {row['id']: row['name'] for row in execute_query("SELECT id, name FROM variants")}
+        self._snapshot = CatalogSnapshot(version, makes, models, variants)
+        return self._snapshot
+
+    def _reload_for_miss(self, snapshot):
+        """
+        Reload after a lookup miss, in at most one thread at a time. Threads
+        that find a load already running return the snapshot they have (and
+        so the miss) instead of waiting for it or reloading again.
+        """
+        if not self._load_lock.acquire(blocking=False):
+            return snapshot
+        try:
+            if self._snapshot is not snapshot:
+                # Reloaded since this thread took its snapshot
+                return self._snapshot
+            if time.monotonic() - self._miss_reload_at < self.miss_reload_interval:
+                return snapshot
+            self._miss_reload_at = time.monotonic()
+            return self._load_locked()
+        finally:
+            self._load_lock.release()
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self.load()
+        return snapshot
+
+    def refresh_if_changed(self):
+        snapshot = self._snapshot
+        if snapshot is None:
+            self.load()
+            return True
+
+        expired = time.monotonic() - snapshot.loaded_at >= self.ttl
+        if expired or self._fetch_version() != snapshot.version:
+            self.load()
+            return True
+        return False
+
+    def start(self):
+        """Load at startup and keep refreshing in a daemon thread"""
+        try:
+            self.load()
+        except Exception as e:
+            print(f"Catalog load failed, will retry in background: {e}")
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='model-catalog', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh_if_changed()
+            except Exception as e:
+                print(f"Catalog refresh failed: {e}")
+
+    def _lookup(self, table, key):
+        if key is None:
+            return None
+        snapshot = self.snapshot()
+        value = getattr(snapshot, table).get(key)
+        if value is None and time.monotonic() - snapshot.loaded_at >= self.miss_reload_interval:
+            # Row added since the last refresh (e.g. a new variant from ingest)
+            snapshot = self._reload_for_miss(snapshot)
+            value = getattr(snapshot, table).get(key)
+        return value
+
+    def models(self):
+        return self.snapshot().model_list
+
+    def make_name(self, make_id):
+        return self._lookup('makes', make_id)
+
+    def model_name(self, model_id):
+        model = self._lookup('models', model_id)
+        return model['name'] if model else None
+
+    def variant_name(self, variant_id):
+        return self._lookup('variants', variant_id)
+
+
+model_catalog = ModelCatalog()
@@ -0,0 +1,9 @@
+-- Adds listings.content_hash to databases created from schema.sql before the
+-- column was part of it. populate_db.py, the scrape pipeline and queue workers
+-- refuse to ingest until it exists. Run once:
+--
+--   psql "$DATABASE_URL" -f backend/migrations/001_listings_content_hash.sql
+--
+-- Existing rows start with a NULL hash, so each is rewritten once on its next
+-- ingest and skipped while unchanged after that.
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
@@ -1,56 +1,143 @@
 from flask import Blueprint, jsonify, request
 from database import execute_query
+from catalog import model_catalog
+from cache import response_cache
 
 listings_bp = Blueprint('listings', __name__, url_prefix='/api')
 analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
 
+DEFAULT_PER_PAGE = 256
+
+def fetch_listings(model_id, page=1, per_page=DEFAULT_PER_PAGE):
+    offset = (page - 1) * per_page
+    
+    query = """
+        SELECT l.id, l.url as listing_url, l.source, l.make_id, l.model_id,
+               l.year, l.variant_id, l.sale_price, l.sale_date, l.mileage,
+               l.number_of_bids, l.location, l.reserve_met
+        FROM listings l
+        WHERE (%s::integer IS NULL OR l.model_id = %s)
+        ORDER BY l.sale_date DESC
+        LIMIT %s OFFSET %s
+    """
+    
+    rows = execute_query(query, (model_id, model_id, per_page, offset))
+    
+    listings = []
+    for row in rows:
+        listing = dict(row)
+        listing['make'] = model_catalog.make_name(listing.pop('make_id'))
+        listing['model'] = model_catalog.model_name(listing.pop('model_id'))
+        listing['trim'] = model_catalog.variant_name(listing.pop('variant_id'))
+        if listing['sale_price']:
+            listing['sale_price'] = listing['sale_price'] / 100
+        if listing['sale_date']:
+            listing['sale_date'] = listing['sale_date'].isoformat()
+        listings.append(listing)
+    
+    return {'listings': listings}
+
+def fetch_trends(model_id):
+    query = """
+        SELECT
+            DATE_TRUNC('month', sale_date) as period,
+            AVG(sale_price) as avg_price,
+            MIN(sale_price) as min_price,
+            MAX(sale_price) as max_price,
+            COUNT(*) as count
+        FROM listings
+        WHERE model_id = %s AND sale_price IS NOT NULL
+        GROUP BY period
+        ORDER BY period
+    """
+    
+    rows = execute_query(query, (model_id,))
+    
+    trends = []
+    for row in rows:
+        trends.append({
+            'period': row['period'].isoformat(),
+            'avg_price': float(row['avg_price']) / 100,
+            'min_price': float(row['min_price']) / 100,
+            'max_price': float(row['max_price']) / 100,
+            'count': row['count']
+        })
+    
+    return {'trends': trends}
+
+def fetch_stats(model_id):
+    query = """
+        SELECT
+            COUNT(*) as total_sales,
+            AVG(sale_price) as avg_price,
+            MIN(sale_price) as min_price,
+            MAX(sale_price) as max_price,
+            AVG(mileage) as avg_mileage,
+            AVG(number_of_bids) as avg_bids
+        FROM listings
+        WHERE model_id = %s AND sale_price IS NOT NULL
+    """
+    
+    row = execute_query(query, (model_id,), fetch_one=True)
+    
+    return {
+        'total_sales': row['total_sales'],
+        'avg_price': float(row['avg_price']) / 100 if row['avg_price'] else None,
+        'min_price': float(row['min_price']) / 100 if row['min_price'] else None,
+        'max_price': float(row['max_price']) / 100 if row['max_price'] else None,
+        'avg_mileage': int(row['avg_mileage']) if row['avg_mileage'] else None,
+        'avg_bids': float(row['avg_bids']) if row['avg_bids'] else None
+    }
+
+def catalog_model_id(value):
+    """model_id query arg as an int, or None if it is not a model in the catalog
+    
+    Only decides whether a response may be cached: requests for other ids are
+    answered from the database as before, so arbitrary ids cannot grow the
+    cache or the popularity counters.
+    """
+    try:
+        model_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    if model_catalog.model_name(model_id) is None:
+        return None
+    return model_id
+
+def cached_response(key, compute):
+    result = response_cache.get(key)
+    if result is None:
+        result = compute()
+        response_cache.set(key, result)
+    return result
+
 @listings_bp.route('/listings')
 def get_listings():
     try:
         model_id = request.args.get('model_id')
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 256, type=int)
-        offset = (page - 1) * per_page
+        per_page = request.args.get('per_page', DEFAULT_PER_PAGE, type=int)
         
-        query = """
-            SELECT l.id, l.url as listing_url, l.source, mk.name as make, md.name as model, 
-                   l.year, v.name as trim, l.sale_price, l.sale_date, l.mileage, 
-                   l.number_of_bids, l.location, l.reserve_met
-            FROM listings l
-            LEFT JOIN makes mk ON l.make_id = mk.id
-            LEFT JOIN models md ON l.model_id = md.id
-            LEFT JOIN variants v ON l.variant_id = v.id
-            WHERE (%s::integer IS NULL OR l.model_id = %s)
-            ORDER BY l.sale_date DESC
-            LIMIT %s OFFSET %s
-        """
-        
-        rows = execute_query(query, (model_id, model_id, per_page, offset))
+        if not model_id:
+            return jsonify(fetch_listings(None, page, per_page))
         
-        listings = []
-        for row in rows:
-            listing = dict(row)
-            if listing['sale_price']:
-                listing['sale_price'] = listing['sale_price'] / 100
-            if listing['sale_date']:
-                listing['sale_date'] = listing['sale_date'].isoformat()
-            listings.append(listing)
+        cache_id = catalog_model_id(model_id)
+        if cache_id is None:
+            return jsonify(fetch_listings(model_id, page, per_page))
         
-        return jsonify({'listings': listings})
+        response_cache.record_request(cache_id)
+        # Only the first page is warmed after an ingest, so only it is cached
+        if page != 1 or per_page != DEFAULT_PER_PAGE:
+            return jsonify(fetch_listings(cache_id, page, per_page))
+        key = ('listings', cache_id, page, per_page)
+        return jsonify(cached_response(key, lambda: fetch_listings(cache_id, page, per_page)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @listings_bp.route('/models')
 def get_models():
     try:
-        query = """
-            SELECT m.id, m.name, mk.name as make_name
-            FROM models m
-            JOIN makes mk ON m.make_id = mk.id
-            ORDER BY mk.name, m.name
-        """
-        rows = execute_query(query)
-        return jsonify([dict(row) for row in rows])
+        return jsonify(model_catalog.models())
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -61,32 +148,11 @@ def get_trends():
         if not model_id:
             return jsonify({'error': 'model_id required'}), 400
         
-        query = """
-            SELECT 
-                DATE_TRUNC('month', sale_date) as period,
-                AVG(sale_price) as avg_price,
-                MIN(sale_price) as min_price,
-                MAX(sale_price) as max_price,
-                COUNT(*) as count
-            FROM listings
-            WHERE model_id = %s AND sale_price IS NOT NULL
-            GROUP BY period
-            ORDER BY period
-        """
-        
-        rows = execute_query(query, (model_id,))
-        
-        trends = []
-        for row in rows:
-            trends.append({
-                'period': row['period'].isoformat(),
-                'avg_price': float(row['avg_price']) / 100,
-                'min_price': float(row['min_price']) / 100,
-                'max_price': float(row['max_price']) / 100,
-                'count': row['count']
-            })
+        cache_id = catalog_model_id(model_id)
+        if cache_id is None:
+            return jsonify(fetch_trends(model_id))
         
-        return jsonify({'trends': trends})
+        return jsonify(cached_response(('trends', cache_id), lambda: fetch_trends(cache_id)))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -97,29 +163,10 @@ def get_stats():
         if not model_id:
             return jsonify({'error': 'model_id required'}), 400
         
-        query = """
-            SELECT 
-                COUNT(*) as total_sales,
-                AVG(sale_price) as avg_price,
-                MIN(sale_price) as min_price,
-                MAX(sale_price) as max_price,
-                AVG(mileage) as avg_mileage,
-                AVG(number_of_bids) as avg_bids
-            FROM listings
-            WHERE model_id = %s AND sale_price IS NOT NULL
-        """
+        cache_id = catalog_model_id(model_id)
+        if cache_id is None:
+            return jsonify(fetch_stats(model_id))
         
-        row = execute_query(query, (model_id,), fetch_one=True)
-        
-        stats = {
-            'total_sales': row['total_sales'],
-            'avg_price': float(row['avg_price']) / 100 if row['avg_price'] else None,
-            'min_price': float(row['min_price']) / 100 if row['min_price'] else None,
-            'max_price': float(row['max_price']) / 100 if row['max_price'] else None,
-            'avg_mileage': int(row['avg_mileage']) if row['avg_mileage'] else None,
-            'avg_bids': float(row['avg_bids']) if row['avg_bids'] else None
-        }
-        
-        return jsonify(stats)
+        return jsonify(cached_response(('stats', cache_id), lambda: fetch_stats(cache_id)))
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
@@ -1,5 +1,6 @@
 -- NFS Index Database Schema
 -- Drop existing tables if they exist
+DROP TABLE IF EXISTS scrape_jobs CASCADE;
 DROP TABLE IF EXISTS listings CASCADE;
 DROP TABLE IF EXISTS variants CASCADE;
 DROP TABLE IF EXISTS models CASCADE;
@@ -45,6 +46,7 @@ CREATE TABLE listings (
     reserve_met BOOLEAN,
     number_of_bids INTEGER,
     location VARCHAR(200),
+    content_hash CHAR(32),
     scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -55,6 +57,31 @@ CREATE INDEX idx_listings_year ON listings(year);
 CREATE INDEX idx_listings_sale_date ON listings(sale_date);
 CREATE INDEX idx_listings_vin ON listings(vin);
 
+-- Work queue for distributed scraping (scraper/work_queue.py). Workers claim
+-- pending jobs with FOR UPDATE SKIP LOCKED and hold them under a lease that
+-- heartbeats extend; failed jobs retry with backoff until max_attempts, then
+-- stay in the 'dead' state for inspection.
+CREATE TABLE scrape_jobs (
+    id BIGSERIAL PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    payload JSONB NOT NULL,
+    dedupe_key VARCHAR(700) NOT NULL UNIQUE,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    leased_by VARCHAR(100),
+    lease_expires_at TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX idx_scrape_jobs_claim ON scrape_jobs(priority, available_at, id) WHERE status = 'pending';
+CREATE INDEX idx_scrape_jobs_lease ON scrape_jobs(lease_expires_at) WHERE status = 'running';
+
 -- Insert initial data for Mercedes-Benz SLR McLaren
 INSERT INTO makes (name) VALUES ('MERCEDES-BENZ');
 
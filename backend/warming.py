@@ -0,0 +1,116 @@
+"""
+Post-ingest cache warming
+
+populate_db.py sends a NOTIFY on the `nfs_index_ingest` channel with the ids
+of the models it touched. The warmer listens on that channel and, for each
+changed model, recomputes the trends, stats and first listings page into the
+response cache so the first dashboard visit after an ingest is not a cold
+query. Models are warmed in order of recent request popularity and a small
+worker pool caps how many run against the database at once.
+"""
+
+import json
+import atexit
+import select
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+
+from database import get_db_connection
+from cache import response_cache
+from catalog import model_catalog
+from routes import fetch_listings, fetch_trends, fetch_stats, DEFAULT_PER_PAGE
+
+INGEST_CHANNEL = 'nfs_index_ingest'
+
+
+class CacheWarmer:
+    def __init__(self, cache=response_cache, max_workers=2):
+        self.cache = cache
+        self.max_workers = max_workers
+        self._pool = None
+        self._thread = None
+        self._stop = threading.Event()
+    
+    def warm_model(self, model_id):
+        model_id = int(model_id)
+        self.cache.invalidate_model(model_id)
+        self.cache.set(('trends', model_id), fetch_trends(model_id))
+        self.cache.set(('stats', model_id), fetch_stats(model_id))
+        self.cache.set(
+            ('listings', model_id, 1, DEFAULT_PER_PAGE),
+            fetch_listings(model_id, 1, DEFAULT_PER_PAGE)
+        )
+    
+    def _warm_safely(self, model_id):
+        try:
+            self.warm_model(model_id)
+        except Exception as e:
+            print(f"Cache warming failed for model {model_id}: {e}")
+    
+    def warm_models(self, model_ids):
+        """Queue changed models for warming, most requested first"""
+        ordered = sorted(set(int(m) for m in model_ids), key=self.cache.popularity, reverse=True)
+        return [self._pool.submit(self._warm_safely, model_id) for model_id in ordered]
+    
+    def handle_notification(self, payload):
+        try:
+            model_ids = json.loads(payload).get('model_ids', [])
+        except (ValueError, AttributeError):
+            print(f"Ignoring malformed ingest notification: {payload!r}")
+            return
+        
+        # A new car may have added makes/models/variants
+        try:
+            model_catalog.refresh_if_changed()
+        except Exception as e:
+            print(f"Catalog refresh failed: {e}")
+        
+        self.warm_models(model_ids)
+    
+    def init_app(self, app):
+        """Start warming for the app's process and shut the pool down when it exits"""
+        app.extensions['cache_warmer'] = self
+        self.start()
+        atexit.register(self.stop)
+    
+    def start(self):
+        if self._thread is None:
+            # Created here rather than in __init__ so importing the module starts no threads
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='cache-warmer')
+            self._thread = threading.Thread(target=self._listen_forever, name='cache-warmer-listen', daemon=True)
+            self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+    
+    def _listen_forever(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"Ingest listener disconnected, reconnecting: {e}")
+                self._stop.wait(5)
+    
+    def _listen(self):
+        conn = get_db_connection()
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {INGEST_CHANNEL}")
+            
+            while not self._stop.is_set():
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self.handle_notification(notify.payload)
+        finally:
+            conn.close()
+
+
+cache_warmer = CacheWarmer()
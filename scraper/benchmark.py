@@ -0,0 +1,531 @@
+"""
+Benchmarks for the scraper and ingest pipeline
+
+Usage:
+    python3 benchmark.py ingest --rows 5000
+    python3 benchmark.py detail --html saved_listing.html --repeat 200
+    python3 benchmark.py detail --url https://bringatrailer.com/listing/<slug>/
+    python3 benchmark.py cards --html saved_results_page.html
+    python3 benchmark.py cards --cards 5000
+    python3 benchmark.py extract --corpus data/json --html saved_listing.html
+    python3 benchmark.py queue --jobs 400 --workers 1 2 4 8
+    python3 benchmark.py pageload --url https://bringatrailer.com/listing/<slug>/ --repeat 3
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import re
+import time
+from datetime import date, datetime, timedelta
+
+BENCH_URL_PREFIX = 'https://bench.nfs-index.invalid/listing/'
+BENCH_MAKE = 'NFS-BENCH'
+BENCH_MODEL = 'BENCHMARK'
+LISTING_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'fixtures', 'listing_*.html')
+
+def make_synthetic_listings(count, variants=8, seed=0):
+    rng = random.Random(seed)
+    start = date(2015, 1, 1)
+    listings = []
+    for i in range(count):
+        listings.append({
+            'url': f"{BENCH_URL_PREFIX}{i}/",
+            'source': 'bringatrailer',
+            'title': f"{2000 + i % 20} Bench Car {i}",
+            'vin': f"BENCH{i:012d}",
+            'year': 2000 + i % 20,
+            'make': BENCH_MAKE,
+            'model': BENCH_MODEL,
+            'variant': f"Trim {i % variants}",
+            'engine': '5.9-Liter V12',
+            'transmission': 'Six-Speed Manual Transaxle',
+            'mileage': rng.randint(1000, 150000),
+            'price': rng.randint(10000, 500000),
+            'sale_date': (start + timedelta(days=i % 3650)).isoformat(),
+            'number_of_bids': rng.randint(1, 80),
+            'location': 'Los Angeles, California 90001'
+        })
+    return listings
+
+def report(label, rows, seconds):
+    rate = rows / seconds if seconds > 0 else float('inf')
+    print(f"  {label:32} {rows:7} rows  {seconds:8.2f}s  {rate:10,.0f} rows/sec")
+
+def report_pages(label, pages, seconds):
+    per_page = seconds / pages * 1000 if pages else 0
+    print(f"  {label:32} {pages:7} pages {seconds:8.2f}s  {per_page:10.2f} ms/page")
+
+def bench_detail(args):
+    import parsers
+    
+    pages = []
+    for path in args.html or []:
+        with open(path, encoding='utf-8') as f:
+            pages.append(f.read())
+    
+    print("="*70)
+    print("Detail page parse benchmark")
+    print("="*70)
+    
+    if args.url:
+        from browser import create_driver
+        driver = create_driver(headless=True)
+        try:
+            driver.get(args.url)
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                html = driver.page_source
+            report_pages("driver.page_source", args.repeat, time.perf_counter() - started)
+            pages.append(html)
+        finally:
+            driver.quit()
+    
+    if not pages:
+        print("  Nothing to parse: pass --html and/or --url")
+        return
+    
+    for i, html in enumerate(pages, 1):
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            detail = parsers.parse_detail(html, sale_price=args.sale_price)
+        report_pages(f"lxml parse_detail (page {i})", args.repeat, time.perf_counter() - started)
+        found = sum(1 for value in detail.values() if value not in ('N/A', None, []))
+        print(f"    {found}/{len(detail)} fields found, {len(html) / 1024:.0f} KB of HTML")
+
+def make_results_page(count, seed=0):
+    """A results page with `count` listing cards shaped like BaT's show-more output"""
+    rng = random.Random(seed)
+    cards = []
+    for i in range(count):
+        miles = f"{rng.randint(1, 99)}k-Mile " if i % 3 == 0 else ''
+        cards.append(
+            f'<a class="listing-card bg-white-transparent" href="/listing/{2000 + i % 20}-bench-car-{i}/">'
+            f'<div class="thumbnail"><img src="/wp-content/uploads/{i}.jpg" alt=""></div>'
+            f'<div class="content-main"><h3>{miles}{2000 + i % 20} Bench Car {i}</h3>'
+            f'<div class="item-excerpt">This car shows {rng.randint(1000, 90000):,} miles and is offered with a clean title.</div></div>'
+            f'<div class="content-secondary"><div class="item-results">Sold for <span>USD ${rng.randint(10000, 500000):,}</span> '
+            f'<span>on {rng.randint(1, 12)}/{rng.randint(1, 28)}/2{rng.randint(0, 5)}</span></div></div></a>'
+        )
+    return (
+        '<html><head><title>Results</title></head><body><div class="auctions-completed-container">'
+        + '\n'.join(cards)
+        + '</div></body></html>'
+    )
+
+def legacy_parse_cards(html):
+    """The previous card path: a BeautifulSoup page parse, then a second parse per card string"""
+    from bs4 import BeautifulSoup
+    import parsers
+    
+    soup = BeautifulSoup(html, 'html.parser')
+    listings = []
+    for card in soup.find_all('a', class_='listing-card'):
+        title_elem = card.find('h3') or card.find('h2')
+        title = title_elem.get_text(strip=True) if title_elem else None
+        url = card.get('href')
+        if title and url:
+            if not url.startswith('http'):
+                url = f"https://bringatrailer.com{url}"
+            listings.append({'url': url, 'title': title, 'card_html': str(card)})
+    
+    parsed = []
+    for listing in listings:
+        card = BeautifulSoup(listing['card_html'], 'html.parser')
+        data = {'url': listing['url'], 'source': 'bringatrailer', 'title': listing['title']}
+        year_match = re.search(r'\b(19|20)\d{2}\b', data['title'])
+        if year_match:
+            data['year'] = int(year_match.group())
+        mileage_match = re.search(r'(\d+\.?\d*)k-Mile', data['title'], re.I)
+        if mileage_match:
+            data['mileage'] = int(float(mileage_match.group(1)) * 1000)
+        results = card.find('div', class_='item-results')
+        if results:
+            text = results.get_text(strip=True)
+            price_match = re.search(r'\$\s?([\d,]+)', text)
+            if price_match:
+                data['price'] = int(price_match.group(1).replace(',', ''))
+            date_match = re.search(r'on\s+(\d{1,2}/\d{1,2}/\d{2,4})', text)
+            if date_match:
+                try:
+                    data['sale_date'] = datetime.strptime(date_match.group(1), '%m/%d/%y').strftime('%Y-%m-%d')
+                except ValueError:
+                    pass
+        if 'mileage' not in data:
+            excerpt = card.find('div', class_='item-excerpt')
+            if excerpt:
+                mileage_match = re.search(r'(\d{1,3}(?:,\d{3})*)\s*miles', excerpt.get_text(), re.I)
+                if mileage_match:
+                    data['mileage'] = int(mileage_match.group(1).replace(',', ''))
+        parsed.append(data)
+    return parsed
+
+def bench_cards(args):
+    import tracemalloc
+    import parsers
+    
+    if args.html:
+        with open(args.html, encoding='utf-8') as f:
+            html = f.read()
+        source = args.html
+    else:
+        html = make_results_page(args.cards)
+        source = f"synthetic page, {args.cards} cards"
+    
+    print("="*70)
+    print(f"Card parse benchmark: {source} ({len(html) / 1024 / 1024:.1f} MB)")
+    print("="*70)
+    
+    results = {}
+    for label, parse in [
+        ('BeautifulSoup page + per-card', legacy_parse_cards),
+        ('lxml iter_cards (one pass)', lambda page: list(parsers.iter_cards(page)))
+    ]:
+        started = time.perf_counter()
+        cards = parse(html)
+        report(label, len(cards), time.perf_counter() - started)
+        
+        # Separate run: tracemalloc itself slows parsing down
+        tracemalloc.start()
+        parse(html)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(f"    peak Python memory {peak / 1024 / 1024:.1f} MB")
+        results[label] = cards
+    
+    legacy, streamed = results.values()
+    if legacy != streamed:
+        mismatched = sum(1 for a, b in zip(legacy, streamed) if a != b) + abs(len(legacy) - len(streamed))
+        print(f"  WARNING: {mismatched} card(s) parsed differently")
+
+def legacy_title_fields(title):
+    data = {}
+    year_match = re.search(r'\b(19|20)\d{2}\b', title)
+    if year_match:
+        data['year'] = int(year_match.group())
+    mileage_match = re.search(r'(\d+\.?\d*)k-Mile', title, re.I)
+    if mileage_match:
+        data['mileage'] = int(float(mileage_match.group(1)) * 1000)
+    return data
+
+def legacy_detail_items(texts):
+    """The previous Listing Details chain (without the chassis link shortcut)"""
+    data = {}
+    for idx, text in enumerate(texts):
+        if 'chassis:' in text.lower():
+            vin_match = re.search(r'chassis:\s*([A-HJ-NPR-Z0-9]{17})', text, re.I)
+            if vin_match:
+                data['vin'] = vin_match.group(1)
+        elif 'miles' in text.lower() and 'mileage' not in data:
+            mileage_match = re.search(r'([\d,]+)\s*(?:k\s+)?miles', text, re.I)
+            if mileage_match:
+                mileage_str = mileage_match.group(1).replace(',', '')
+                if 'k' in text.lower():
+                    data['mileage'] = int(float(mileage_str) * 1000)
+                else:
+                    data['mileage'] = int(mileage_str)
+        elif 'speed' in text.lower() and 'transmission' not in data:
+            normalized_text = text.replace('‑', '-').replace('–', '-').replace('—', '-')
+            transmission_match = re.search(r'[\w\s-]*\b(\w+)-Speed[\w\s-]*', normalized_text, re.I)
+            if transmission_match:
+                data['transmission'] = transmission_match.group(0).strip()
+        elif 'paint' in text.lower() and 'exterior_color' not in data:
+            paint_match = re.search(r'(.+?Paint)', text, re.I)
+            if paint_match:
+                data['exterior_color'] = paint_match.group(1).strip()
+                if idx + 1 < len(texts) and texts[idx + 1]:
+                    data['interior_color'] = texts[idx + 1]
+        elif ('liter' in text.lower() or 'L' in text) and 'engine' not in data:
+            normalized_text = text.replace('‑', '-').replace('–', '-').replace('—', '-')
+            engine_match = re.search(r'[\w\s-]*\b(\d+\.?\d*)[- ]?(?:Liter|L)\b[\w\s-]*', normalized_text, re.I)
+            if engine_match:
+                data['engine'] = engine_match.group(0).strip()
+    return data
+
+def load_corpus(args):
+    """Titles and Listing Details lists from scraped JSON and saved listing pages"""
+    import glob
+    import json
+    import lxml.html
+    
+    titles, detail_lists = [], []
+    for path in glob.glob(os.path.join(args.corpus, '**', '*.json'), recursive=True):
+        try:
+            with open(path) as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not isinstance(records, list):
+            continue
+        for record in records:
+            if isinstance(record, dict) and record.get('title'):
+                titles.append(record['title'])
+                if record.get('listing_details'):
+                    detail_lists.append(record['listing_details'])
+    
+    # Scraped JSON from before listing_details was recorded has none; fall
+    # back to the saved listing pages the tests use
+    html_paths = args.html or ([] if detail_lists else sorted(glob.glob(LISTING_FIXTURES)))
+    for path in html_paths:
+        with open(path, encoding='utf-8') as f:
+            tree = lxml.html.fromstring(f.read())
+        for ul in tree.xpath("//*[contains(@class, 'essentials')]//ul"):
+            detail_lists.append([' '.join(li.text_content().split()) for li in ul.iter('li')])
+    return titles, detail_lists
+
+def bench_extract(args):
+    import extract
+    
+    titles, detail_lists = load_corpus(args)
+    
+    def new_detail_items(texts):
+        data = {}
+        for idx, text in enumerate(texts):
+            rule = extract.detail_item_rule(text, data)
+            if rule is None:
+                continue
+            value = extract.detail_item_value(rule, text)
+            if value is not None:
+                data[rule.field] = value
+                if rule.field == 'exterior_color' and idx + 1 < len(texts) and texts[idx + 1]:
+                    data['interior_color'] = texts[idx + 1]
+        return data
+    
+    print("="*70)
+    print(f"Field extraction benchmark: {len(titles)} titles, {len(detail_lists)} detail lists")
+    print("="*70)
+    
+    suites = [
+        ('titles', titles, legacy_title_fields, extract.TITLE.extract),
+        ('listing details', detail_lists, legacy_detail_items, new_detail_items),
+    ]
+    for name, corpus, legacy, current in suites:
+        if not corpus:
+            print(f"  {name}: no samples")
+            continue
+        for label, func in [(f"{name} (inline re)", legacy), (f"{name} (extract tables)", current)]:
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                for sample in corpus:
+                    func(sample)
+            report(label, len(corpus) * args.repeat, time.perf_counter() - started)
+        
+        # Regression check: the rule tables must give the same fields as the inline code
+        differing = [sample for sample in corpus if legacy(sample) != current(sample)]
+        if differing:
+            print(f"    {len(differing)} sample(s) differ, e.g. {differing[0]!r}")
+
+def bench_ingest(args):
+    import populate_db
+    
+    conn = populate_db.get_db_connection()
+    listings = make_synthetic_listings(args.rows)
+    
+    def cleanup():
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM listings WHERE url LIKE %s", (BENCH_URL_PREFIX + '%',))
+        conn.commit()
+    
+    make_id = populate_db.get_or_create_make(conn, BENCH_MAKE)
+    model_id = populate_db.get_or_create_model(conn, make_id, BENCH_MODEL)
+    
+    print("="*70)
+    print(f"Ingest benchmark: {args.rows} synthetic listings")
+    print("="*70)
+    
+    # The second pass re-ingests identical data, so it measures the content-hash skip path
+    phases = ['insert', 'unchanged']
+    
+    try:
+        populate_db.require_content_hash_column(conn)
+        cleanup()
+        for phase in phases:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                populate_db.ingest_row_by_row(conn, listings, make_id, model_id)
+            report(f"row-by-row ({phase})", len(listings), time.perf_counter() - started)
+        cleanup()
+        
+        for phase in phases:
+            started = time.perf_counter()
+            populate_db.bulk_ingest_listings(conn, listings, make_id, model_id)
+            conn.commit()
+            report(f"bulk COPY+merge ({phase})", len(listings), time.perf_counter() - started)
+    finally:
+        conn.rollback()
+        cleanup()
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM variants WHERE model_id = %s", (model_id,))
+            cur.execute("DELETE FROM models WHERE id = %s", (model_id,))
+            cur.execute("DELETE FROM makes WHERE id = %s", (make_id,))
+        conn.commit()
+        conn.close()
+
+def network_totals(log_entries):
+    """(bytes received, requests, blocked requests) from Chrome performance log entries"""
+    received = 0
+    requests = 0
+    blocked = 0
+    for entry in log_entries:
+        message = json.loads(entry['message'])['message']
+        method = message.get('method')
+        params = message.get('params', {})
+        if method == 'Network.requestWillBeSent':
+            requests += 1
+        elif method == 'Network.loadingFinished':
+            received += params.get('encodedDataLength', 0)
+        elif method == 'Network.loadingFailed' and params.get('blockedReason'):
+            blocked += 1
+    return received, requests, blocked
+
+def bench_pageload(args):
+    from browser import create_driver, blocking_profile
+    
+    print("="*70)
+    print(f"Page load benchmark: {len(args.url)} page(s) x {args.repeat}, cache disabled")
+    print("="*70)
+    
+    for level in ('off', args.block):
+        blocking = blocking_profile(level, args.block_allow)
+        driver = create_driver(headless=True, blocking=blocking, performance_log=True)
+        try:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setCacheDisabled', {'cacheDisabled': True})
+            loads = []
+            for _ in range(args.repeat):
+                for url in args.url:
+                    if blocking:
+                        blocking.apply(driver, args.page_type)
+                    driver.get('about:blank')
+                    driver.get_log('performance')
+                    started = time.perf_counter()
+                    driver.get(url)
+                    seconds = time.perf_counter() - started
+                    loads.append((seconds,) + network_totals(driver.get_log('performance')))
+        finally:
+            driver.quit()
+        
+        count = len(loads)
+        print(
+            f"  block={level:7} {sum(l[0] for l in loads) / count * 1000:8.0f} ms/page  "
+            f"{sum(l[1] for l in loads) / count / 1024:8.0f} KB/page  "
+            f"{sum(l[2] for l in loads) / count:6.0f} requests/page  {sum(l[3] for l in loads) / count:5.0f} blocked"
+        )
+
+def queue_bench_worker(index, job_seconds, results):
+    import populate_db
+    import work_queue
+    
+    conn = populate_db.get_db_connection()
+    queue = work_queue.JobQueue(conn, f"bench-{os.getpid()}-{index}")
+    done = 0
+    try:
+        while True:
+            job = queue.claim(kinds=['bench'])
+            if job is None:
+                break
+            # Stands in for a page load: the worker is busy but holds no database locks
+            time.sleep(job_seconds)
+            if queue.complete(job['id']):
+                done += 1
+    finally:
+        conn.close()
+    results.put(done)
+
+def bench_queue(args):
+    import multiprocessing
+    import populate_db
+    import work_queue
+    
+    conn = populate_db.get_db_connection()
+    work_queue.ensure_queue_table(conn)
+    
+    def cleanup():
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM scrape_jobs WHERE kind = 'bench'")
+        conn.commit()
+    
+    print("="*70)
+    print(f"Work queue benchmark: {args.jobs} jobs of {args.job_ms}ms per worker count")
+    print("="*70)
+    
+    base_rate = None
+    try:
+        for workers in args.workers:
+            cleanup()
+            for i in range(args.jobs):
+                work_queue.enqueue(conn, 'bench', {'n': i}, f"bench:{workers}:{i}")
+            conn.commit()
+            
+            results = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(target=queue_bench_worker, args=(i, args.job_ms / 1000, results))
+                for i in range(workers)
+            ]
+            started = time.perf_counter()
+            for process in processes:
+                process.start()
+            done = sum(results.get() for _ in processes)
+            for process in processes:
+                process.join()
+            seconds = time.perf_counter() - started
+            
+            rate = done / seconds
+            base_rate = base_rate or rate
+            print(f"  {workers:3} worker(s) {done:7} jobs  {seconds:8.2f}s  {rate:10,.1f} jobs/sec  "
+                  f"{rate / base_rate:5.2f}x (ideal {workers / args.workers[0]:.0f}x)")
+            if done != args.jobs:
+                print(f"    {args.jobs - done} job(s) were not completed exactly once")
+    finally:
+        conn.rollback()
+        cleanup()
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='NFS Index benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    ingest = subparsers.add_parser('ingest', help='Row-by-row vs bulk ingest throughput (uses DATABASE_URL)')
+    ingest.add_argument('--rows', type=int, default=2000, help='Number of synthetic listings')
+    ingest.set_defaults(func=bench_ingest)
+    
+    detail = subparsers.add_parser('detail', help='Time per detail page for the page_source + lxml parser')
+    detail.add_argument('--html', nargs='+', help='Saved listing page(s)')
+    detail.add_argument('--url', help='Listing URL to load once in headless Chrome')
+    detail.add_argument('--sale-price', type=int, help='Sale price used to match the high bidder')
+    detail.add_argument('--repeat', type=int, default=100, help='Parses per page')
+    detail.set_defaults(func=bench_detail)
+    
+    cards = subparsers.add_parser('cards', help='Listing card extraction on a large results page')
+    cards.add_argument('--html', help='Saved results page (after show-more)')
+    cards.add_argument('--cards', type=int, default=3000, help='Cards in the synthetic page when --html is not given')
+    cards.set_defaults(func=bench_cards)
+    
+    extract_cmd = subparsers.add_parser('extract', help='Inline regexes vs extract.py rule tables on a text corpus')
+    extract_cmd.add_argument('--corpus', default='data/json', help='Directory of scraped JSON (titles, listing details)')
+    extract_cmd.add_argument('--html', nargs='+', help='Saved listing pages for detail bullets (default: tests/fixtures when the corpus has none)')
+    extract_cmd.add_argument('--repeat', type=int, default=5, help='Passes over the corpus')
+    extract_cmd.set_defaults(func=bench_extract)
+    
+    pageload = subparsers.add_parser('pageload', help='Browser load time and bytes per page with resource blocking off and on')
+    pageload.add_argument('--url', nargs='+', required=True, help='Page(s) to load, e.g. listing detail pages')
+    pageload.add_argument('--page-type', choices=['model', 'detail'], default='detail', help='Page type for --block-allow exceptions')
+    pageload.add_argument('--block', choices=['assets', 'all'], default='all', help='Blocking level compared against off')
+    pageload.add_argument('--block-allow', nargs='+', default=[], metavar='PAGE:CATEGORY', help='Per-page-type exceptions')
+    pageload.add_argument('--repeat', type=int, default=3, help='Loads per page and mode')
+    pageload.set_defaults(func=bench_pageload)
+    
+    queue_cmd = subparsers.add_parser('queue', help='Work-queue throughput as worker processes are added (uses DATABASE_URL)')
+    queue_cmd.add_argument('--jobs', type=int, default=400, help='Jobs per worker count')
+    queue_cmd.add_argument('--job-ms', type=int, default=50, help='Simulated work per job in milliseconds')
+    queue_cmd.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8], help='Worker counts to compare')
+    queue_cmd.set_defaults(func=bench_queue)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
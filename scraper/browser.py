@@ -0,0 +1,281 @@
+"""
+Chrome WebDriver setup shared by the scraper and its worker pools
+
+The chromedriver binary is resolved once and its path cached on disk, so only
+the first run (or the first after the cache expires) goes through
+ChromeDriverManager. BrowserSession keeps started browsers warm across car
+configs and recycles them after too many pages or too much heap growth.
+A BlockingProfile stops browsers fetching images, media, fonts and trackers,
+since the scraper only reads text from the DOM.
+"""
+
+import json
+import os
+import threading
+import time
+
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+
+DRIVER_CACHE_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'nfs-index', 'chromedriver.json')
+# Chrome auto-updates, so re-check for a matching driver now and then
+DRIVER_CACHE_MAX_AGE = 7 * 24 * 3600
+
+# Network.setBlockedURLs patterns per resource category ('*' is a wildcard)
+BLOCK_PATTERNS = {
+    'images': ('*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.avif*', '*.svg*', '*.ico*'),
+    'media': ('*.mp4*', '*.webm*', '*.m3u8*', '*.mp3*', '*.mov*',
+              '*youtube.com/embed*', '*youtube-nocookie.com*', '*ytimg.com*', '*player.vimeo.com*', '*vimeocdn.com*'),
+    'fonts': ('*.woff*', '*.ttf*', '*.otf*', '*.eot*', '*fonts.googleapis.com*', '*fonts.gstatic.com*', '*use.typekit.net*'),
+    'trackers': ('*googletagmanager.com*', '*google-analytics.com*', '*doubleclick.net*', '*googlesyndication.com*',
+                 '*googleadservices.com*', '*connect.facebook.net*', '*facebook.com/tr*', '*hotjar.com*',
+                 '*segment.com*', '*segment.io*', '*nr-data.net*', '*newrelic.com*', '*quantserve.com*',
+                 '*scorecardresearch.com*', '*criteo.com*', '*criteo.net*', '*taboola.com*', '*outbrain.com*',
+                 '*adsrvr.org*', '*amazon-adsystem.com*', '*bat.bing.com*', '*clarity.ms*',
+                 '*analytics.tiktok.com*', '*sentry.io*', '*intercom.io*'),
+}
+
+BLOCK_LEVELS = {
+    'off': (),
+    'assets': ('images', 'media', 'fonts'),
+    'all': ('images', 'media', 'fonts', 'trackers'),
+}
+
+class BlockingProfile:
+    """
+    Resource categories browsers should not fetch, with per-page-type
+    exceptions: allow={'detail': ['images']} still loads images on listing
+    pages. Blocking uses CDP Network.setBlockedURLs, re-applied only when a
+    load is for a page type with a different set of patterns. Images blocked
+    on every page type are also turned off with a Chrome preference.
+    """
+
+    def __init__(self, block=BLOCK_LEVELS['all'], allow=None):
+        self.block = tuple(block)
+        self.allow = {page_type: set(categories) for page_type, categories in (allow or {}).items()}
+        self._applied = {}
+        self._lock = threading.Lock()
+
+    def patterns(self, page_type=None):
+        allowed = self.allow.get(page_type, ())
+        return tuple(
+            pattern
+            for category in self.block if category not in allowed
+            for pattern in BLOCK_PATTERNS[category]
+        )
+
+    def prefs(self):
+        if 'images' in self.block and not any('images' in allowed for allowed in self.allow.values()):
+            return {"profile.managed_default_content_settings.images": 2}
+        return {}
+
+    def apply(self, driver, page_type=None, force=False):
+        """Block this page type's patterns in `driver` before it loads the page"""
+        patterns = self.patterns(page_type)
+        with self._lock:
+            if not force and self._applied.get(id(driver)) == patterns:
+                return
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patterns)})
+        with self._lock:
+            self._applied[id(driver)] = patterns
+
+    def forget(self, driver):
+        """Drop what was applied to a browser that has been quit"""
+        with self._lock:
+            self._applied.pop(id(driver), None)
+
+def blocking_profile(level='all', allow=()):
+    """BlockingProfile from a BLOCK_LEVELS name and "page_type:category" exceptions, or None for 'off'"""
+    if not BLOCK_LEVELS[level]:
+        return None
+    exceptions = {}
+    for rule in allow:
+        page_type, category = rule.split(':', 1)
+        if category not in BLOCK_PATTERNS:
+            raise ValueError(f"Unknown resource category {category!r} in {rule!r}")
+        exceptions.setdefault(page_type, []).append(category)
+    return BlockingProfile(BLOCK_LEVELS[level], exceptions)
+
+def chrome_options(headless=False, blocking=None, performance_log=False):
+    options = Options()
+
+    prefs = {"profile.default_content_setting_values.notifications": 2}
+    if blocking:
+        prefs.update(blocking.prefs())
+    options.add_experimental_option("prefs", prefs)
+    if performance_log:
+        # Network events in driver.get_log('performance'), e.g. for byte counts
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    if headless:
+        options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-notifications')
+    options.add_argument('user-agent=Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36')
+    return options
+
+def resolve_driver_path(refresh=False):
+    """Path to chromedriver: $CHROMEDRIVER_PATH, the on-disk cache, or a fresh ChromeDriverManager install"""
+    if os.environ.get('CHROMEDRIVER_PATH'):
+        return os.environ['CHROMEDRIVER_PATH']
+
+    if not refresh:
+        try:
+            with open(DRIVER_CACHE_FILE) as f:
+                cached = json.load(f)
+            if time.time() - cached['resolved_at'] < DRIVER_CACHE_MAX_AGE and os.access(cached['path'], os.X_OK):
+                return cached['path']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    path = ChromeDriverManager().install()
+    try:
+        os.makedirs(os.path.dirname(DRIVER_CACHE_FILE), exist_ok=True)
+        with open(DRIVER_CACHE_FILE, 'w') as f:
+            json.dump({'path': path, 'resolved_at': time.time()}, f)
+    except OSError as e:
+        print(f"  Could not cache chromedriver path: {e}")
+    return path
+
+def create_driver(headless=False, blocking=None, performance_log=False):
+    options = chrome_options(headless, blocking, performance_log)
+    try:
+        driver = webdriver.Chrome(service=Service(resolve_driver_path()), options=options)
+    except Exception:
+        if os.environ.get('CHROMEDRIVER_PATH'):
+            raise
+        # Most likely Chrome updated past the cached driver; resolve again once
+        driver = webdriver.Chrome(service=Service(resolve_driver_path(refresh=True)), options=options)
+
+    if blocking:
+        driver.execute_cdp_cmd('Network.enable', {})
+        blocking.apply(driver, force=True)
+    return driver
+
+def is_alive(driver):
+    """False once the browser or its session has gone away"""
+    try:
+        driver.execute_script("return 1")
+        return True
+    except Exception:
+        return False
+
+def heap_mb(driver):
+    """JS heap in use by the current tab, in MB (None if the browser does not report it)"""
+    try:
+        used = driver.execute_script("return performance.memory ? performance.memory.usedJSHeapSize : null")
+    except Exception:
+        return None
+    return used / (1024 * 1024) if used else None
+
+class BrowserSession:
+    """
+    Pool of warm browsers shared by every scraper in a run.
+
+    acquire() hands out an idle browser (or starts one), release() resets it
+    and keeps up to `keep` of them idle for the next car. A browser is quit
+    instead of reused once it has loaded `max_pages` pages or its heap has
+    grown past `max_heap_mb`. Browsers start with the `blocking` profile.
+    """
+
+    def __init__(self, headless=False, keep=1, max_pages=300, max_heap_mb=768, blocking=None):
+        self.headless = headless
+        self.blocking = blocking
+        self.keep = keep
+        self.max_pages = max_pages
+        self.max_heap_mb = max_heap_mb
+        self.started = 0
+        self.recycled = 0
+        self._idle = []
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            while self._idle:
+                driver = self._idle.pop()
+                if is_alive(driver):
+                    return driver
+                self._pages.pop(id(driver), None)
+                if self.blocking:
+                    self.blocking.forget(driver)
+
+        driver = create_driver(self.headless, self.blocking)
+        with self._lock:
+            self.started += 1
+            self._pages[id(driver)] = 0
+        return driver
+
+    def get(self, driver, url):
+        """driver.get(url), counted towards the browser's recycle limit"""
+        driver.get(url)
+        with self._lock:
+            self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+
+    def worn_out(self, driver):
+        if self._pages.get(id(driver), 0) >= self.max_pages:
+            return True
+        heap = heap_mb(driver)
+        return heap is not None and heap > self.max_heap_mb
+
+    def recycle_if_needed(self, driver):
+        """Return `driver`, or a fresh browser in its place if it is worn out"""
+        if not self.worn_out(driver):
+            return driver
+        self._retire(driver)
+        return self.acquire()
+
+    def reset(self, driver):
+        """Drop cookies, storage and extra windows left by the previous run"""
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except Exception:
+            pass
+        driver.delete_all_cookies()
+        driver.get('about:blank')
+
+    def release(self, driver):
+        if self.worn_out(driver):
+            self._retire(driver)
+            return
+        try:
+            self.reset(driver)
+        except Exception:
+            self._quit(driver)
+            return
+
+        with self._lock:
+            if len(self._idle) < self.keep:
+                self._idle.append(driver)
+                return
+        self._quit(driver)
+
+    def _retire(self, driver):
+        with self._lock:
+            self.recycled += 1
+        self._quit(driver)
+
+    def _quit(self, driver):
+        with self._lock:
+            self._pages.pop(id(driver), None)
+        if self.blocking:
+            self.blocking.forget(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            self._quit(driver)
+        print(f"Browser session: {self.started} browser(s) started, {self.recycled} recycled")
@@ -0,0 +1,157 @@
+"""
+Append-only run journal for resuming interrupted scrapes
+
+Every finished detail page is journaled as soon as it is parsed: the output
+record for a kept listing, or just its url for one that was rejected (no VIN,
+non-USA). Finished model pages and cars are journaled too. Each line is
+flushed and fsync'd, so a crash loses at most the listing in progress.
+
+With --resume the journal is replayed: finished cars are skipped, finished
+model pages return their journaled records, and on a page that was cut short
+only the listings without a journal line are fetched again. Failed fetches
+are never journaled, so they are retried on resume.
+
+A run that got through every car ends its journal with a finish line. A new
+run will not overwrite a journal without one unless asked to (fresh=True),
+so a plain rerun cannot wipe the state of an interrupted run.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+DEFAULT_JOURNAL_PATH = os.path.join('data', 'checkpoints', 'scrape_journal.jsonl')
+
+def unfinished_run(path):
+    """True if the journal at path has progress from a run that never finished"""
+    progress = False
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    kind = json.loads(line).get('type')
+                except ValueError:
+                    continue
+                if kind == 'start':
+                    progress = False
+                elif kind in ('listing', 'page_done', 'car_done'):
+                    progress = True
+                elif kind == 'finish':
+                    progress = False
+    except FileNotFoundError:
+        return False
+    return progress
+
+class RunJournal:
+    def __init__(self, path=DEFAULT_JOURNAL_PATH, resume=False, fresh=False):
+        if not resume and not fresh and unfinished_run(path):
+            raise ValueError(
+                f"{path} holds an interrupted run; resume it with --resume or discard it with --fresh"
+            )
+        self.path = path
+        self._lock = threading.Lock()
+        # (car, page) -> {listing url: output record, or None if rejected}
+        self._outcomes = {}
+        self._pages_done = set()
+        self._cars_done = set()
+
+        if resume:
+            self._replay()
+
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # A fresh run starts a new journal; a resumed one keeps appending
+        self._file = open(path, 'a' if resume else 'w')
+        self._write({'type': 'resume' if resume else 'start'})
+
+    def _replay(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from the crash
+                        continue
+                    kind = entry.get('type')
+                    if kind == 'listing':
+                        page = self._outcomes.setdefault((entry['car'], entry['page']), {})
+                        page[entry['url']] = entry.get('record')
+                    elif kind == 'page_done':
+                        self._pages_done.add((entry['car'], entry['page']))
+                    elif kind == 'car_done':
+                        self._cars_done.add(entry['car'])
+        except FileNotFoundError:
+            pass
+
+    def _write(self, entry):
+        entry['at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    @property
+    def restored(self):
+        return sum(len(page) for page in self._outcomes.values())
+
+    def car(self, key):
+        return CarJournal(self, key)
+
+    def car_done(self, key):
+        return key in self._cars_done
+
+    def urls(self, key):
+        """Every listing url journaled for a car, kept or rejected"""
+        return [url for (car, _), outcomes in self._outcomes.items() if car == key for url in outcomes]
+
+    def mark_car_done(self, key):
+        self._cars_done.add(key)
+        self._write({'type': 'car_done', 'car': key})
+
+    def finish(self):
+        """Every car of the run is done; the journal no longer needs protecting"""
+        self._write({'type': 'finish'})
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+class CarJournal:
+    """The part of a RunJournal for one car, as ModelPageScraper uses it"""
+
+    def __init__(self, journal, key):
+        self.journal = journal
+        self.key = key
+
+    def page_done(self, page):
+        return (self.key, page) in self.journal._pages_done
+
+    def outcome(self, page, url):
+        """(True, record or None) if url was finished on page, else (False, None)"""
+        outcomes = self.journal._outcomes.get((self.key, page), {})
+        if url in outcomes:
+            return True, outcomes[url]
+        return False, None
+
+    def records(self, page):
+        """Kept records of a finished page, in the order they were scraped"""
+        outcomes = self.journal._outcomes.get((self.key, page), {})
+        return [record for record in outcomes.values() if record is not None]
+
+    def urls(self, page):
+        """Every listing url journaled on a page, kept or rejected"""
+        return list(self.journal._outcomes.get((self.key, page), {}))
+
+    def record_listing(self, page, url, record):
+        self.journal._outcomes.setdefault((self.key, page), {})[url] = record
+        self.journal._write({'type': 'listing', 'car': self.key, 'page': page, 'url': url, 'record': record})
+
+    def record_rejected(self, page, url):
+        self.record_listing(page, url, None)
+
+    def mark_page_done(self, page):
+        self.journal._pages_done.add((self.key, page))
+        self.journal._write({'type': 'page_done', 'car': self.key, 'page': page})
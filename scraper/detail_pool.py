@@ -0,0 +1,113 @@
+"""
+Pool of browser workers for listing detail pages
+
+Each worker thread owns its own WebDriver and pulls detail URLs from the
+executor's shared queue. Results are yielded in submission order with a
+bounded look-ahead, so the caller can apply its filters and max_listings
+cutoff exactly as in the sequential loop and stop early without fetching the
+whole model page. A worker whose browser crashes gets a fresh one and retries
+the URL once; fetch_detail does the same for the scraper's own browser when
+details are fetched without a pool.
+"""
+
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from browser import is_alive
+from waits import PageWaiter
+
+def replace_driver(session, driver):
+    session['driver'] = driver
+    # Keep the timings collected so far; only the driver changes
+    session['waiter'].driver = driver
+
+def restart_driver(scraper, session):
+    try:
+        # Through the scraper, so the browser session and blocking profile drop the dead browser
+        scraper.release_driver(session['driver'])
+    except Exception:
+        pass
+    replace_driver(session, scraper.new_driver())
+
+def fetch_detail(scraper, session, url, sale_price):
+    """
+    Detail dict for url on session['driver'] (with session['waiter']). A
+    crashed browser is replaced and the URL retried once. Returns the detail
+    and the number of browsers restarted.
+    """
+    restarts = 0
+    for attempt in range(2):
+        detail = scraper.scrape_listing_detail(
+            url, sale_price=sale_price, driver=session['driver'], waiter=session['waiter']
+        )
+        if is_alive(session['driver']):
+            driver = scraper.refresh_driver(session['driver'])
+            if driver is not session['driver']:
+                replace_driver(session, driver)
+            return detail, restarts
+        print(f"    Browser crashed on {url}, restarting")
+        restart_driver(scraper, session)
+        restarts += 1
+    return detail, restarts
+
+class DetailWorkerPool:
+    def __init__(self, scraper, workers, lookahead=2):
+        self.scraper = scraper
+        self.workers = workers
+        self.window = workers * lookahead
+        self.restarts = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='detail-worker')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._sessions = []
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            driver = self.scraper.new_driver()
+            session = {'driver': driver, 'waiter': PageWaiter(driver)}
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def _fetch(self, url, sale_price):
+        detail, restarts = fetch_detail(self.scraper, self._session(), url, sale_price)
+        if restarts:
+            with self._lock:
+                self.restarts += restarts
+        return detail
+
+    def iter_details(self, tasks):
+        """Yield the detail dict for each (url, sale_price) task, in order"""
+        tasks = iter(tasks)
+        pending = deque()
+
+        def fill():
+            while len(pending) < self.window:
+                try:
+                    url, sale_price = next(tasks)
+                except StopIteration:
+                    return
+                pending.append(self._executor.submit(self._fetch, url, sale_price))
+
+        try:
+            fill()
+            while pending:
+                detail = pending.popleft().result()
+                yield detail
+                fill()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        for session in self._sessions:
+            self.scraper.waiter.absorb(session['waiter'])
+            try:
+                self.scraper.release_driver(session['driver'])
+            except Exception:
+                pass
+        self._sessions = []
@@ -0,0 +1,138 @@
+"""
+Table-driven field extraction for titles, essentials and comments
+
+Every field the scraper pulls out of text is a Rule in one of the tables
+below. Patterns are compiled once at import, and a table is applied in order,
+skipping fields that are already known and stopping at the first hit for each
+field, so "try pattern A, then pattern B" fallbacks cost nothing once A has
+matched.
+"""
+
+import re
+from collections import namedtuple
+from datetime import datetime
+
+# field:   key in the result dict
+# pattern: regex source; its capture groups are passed to convert
+# convert: callable(*groups) -> value, or None to drop the match
+# last:    take the last match in the text instead of the first
+# flags:   re flags for the pattern
+Rule = namedtuple('Rule', ['field', 'pattern', 'convert', 'last', 'flags'], defaults=[None, False, 0])
+
+def to_int(digits):
+    return int(digits.replace(',', ''))
+
+def thousands(number):
+    return int(float(number) * 1000)
+
+def us_date(text):
+    try:
+        return datetime.strptime(text, '%m/%d/%y').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+def miles(number, k):
+    number = float(number.replace(',', ''))
+    return int(number * 1000) if k else int(number)
+
+class Extractor:
+    def __init__(self, rules):
+        self.rules = [(rule, re.compile(rule.pattern, rule.flags)) for rule in rules]
+        self.fields = frozenset(rule.field for rule, _ in self.rules)
+
+    def extract(self, text, into=None):
+        """
+        Fields found in text. With `into`, fields already present there are
+        left alone and new ones are added to it.
+        """
+        result = into if into is not None else {}
+        for rule, pattern in self.rules:
+            if rule.field in result:
+                continue
+            if rule.last:
+                match = None
+                for match in pattern.finditer(text):
+                    pass
+            else:
+                match = pattern.search(text)
+            if match is None:
+                continue
+            args = match.groups() or (match.group(),)
+            value = rule.convert(*args) if rule.convert else args[0]
+            if value is not None:
+                result[rule.field] = value
+        return result
+
+TITLE = Extractor([
+    Rule('year', r'\b((?:19|20)\d{2})\b', int),
+    Rule('mileage', r'(\d+\.?\d*)k-Mile', thousands, flags=re.I),
+])
+
+CARD_RESULTS = Extractor([
+    Rule('price', r'\$\s?([\d,]+)', to_int),
+    Rule('sale_date', r'on\s+(\d{1,2}/\d{1,2}/\d{2,4})', us_date),
+])
+
+EXCERPT = Extractor([
+    Rule('mileage', r'(\d{1,3}(?:,\d{3})*)\s*miles', to_int, flags=re.I),
+])
+
+# Bid comments read like "USD $1,921,000 bid placed by"
+BID_AMOUNT = Extractor([Rule('amount', r'USD\s+\$([0-9,]+)', to_int, flags=re.I)])
+
+BID_THREAD = Extractor([Rule('high_bidder', r'bid\s+placed\s+by\s+(\w+)', last=True, flags=re.I)])
+
+LOT = Extractor([Rule('lot_number', r'#?(\d+)')])
+
+FIRST_NUMBER = Extractor([Rule('number', r'(\d+)', int)])
+
+TRANSMISSION_IN_TITLE = re.compile(r'\d+-Speed', re.I)
+
+# "Listing Details" bullets. A bullet is handled by the first rule (in table
+# order) whose keyword it contains and whose field is still open; only that
+# rule's value pattern is tried. `keywords` are matched case-insensitively,
+# `exact` as written (e.g. the "L" in "5.4L").
+DetailItemRule = namedtuple('DetailItemRule', ['field', 'keywords', 'exact', 'value', 'convert', 'overwrite'])
+
+DETAIL_ITEM_RULES = [
+    DetailItemRule('vin', ('chassis:',), (), re.compile(r'chassis:\s*([A-HJ-NPR-Z0-9]{17})', re.I),
+                   lambda m: m.group(1), True),
+    # Scaled by 1000 only for a "k" right before "miles", as in "12.5k Miles"
+    DetailItemRule('mileage', ('miles',), (), re.compile(r'([\d,]+(?:\.\d+)?)\s*(k\s+)?miles', re.I),
+                   lambda m: miles(m.group(1), m.group(2)), False),
+    DetailItemRule('transmission', ('speed',), (), re.compile(r'[\w\s-]*\b(\w+)-Speed[\w\s-]*', re.I),
+                   lambda m: m.group(0).strip(), False),
+    DetailItemRule('exterior_color', ('paint',), (), re.compile(r'(.+?Paint)', re.I),
+                   lambda m: m.group(1).strip(), False),
+    DetailItemRule('engine', ('liter',), ('L',), re.compile(r'[\w\s-]*\b(\d+\.?\d*)[- ]?(?:Liter|L)\b[\w\s-]*', re.I),
+                   lambda m: m.group(0).strip(), False),
+]
+
+_HYPHENS = str.maketrans({'‑': '-', '–': '-', '—': '-'})
+
+# Every bullet goes through detail_item_rule, so the open-field check comes
+# first and the keywords are scanned with plain loops: any() over generators
+# made the table slower than the inline chain it replaced
+_RULE_SCAN = [(rule, rule.field, rule.keywords, rule.exact, rule.overwrite) for rule in DETAIL_ITEM_RULES]
+
+def detail_item_rule(text, detail_data):
+    """The rule that applies to one Listing Details bullet, or None"""
+    lower = text.lower()
+    for rule, field, keywords, exact, overwrite in _RULE_SCAN:
+        if not overwrite and field in detail_data:
+            continue
+        for keyword in keywords:
+            if keyword in lower:
+                return rule
+        for keyword in exact:
+            if keyword in text:
+                return rule
+    return None
+
+def detail_item_value(rule, text):
+    """Value for the bullet's field, or None if its pattern does not match"""
+    if rule.field in ('transmission', 'engine'):
+        # Non-breaking and en/em dashes would stop "Six-Speed" or "5.9-Liter" matching
+        text = text.translate(_HYPHENS)
+    match = rule.value.search(text)
+    return rule.convert(match) if match else None
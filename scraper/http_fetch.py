@@ -0,0 +1,129 @@
+"""
+Selenium-free page fetching over a pooled async HTTP client
+
+HttpFetcher runs an aiohttp ClientSession on its own event loop thread, so the
+synchronous scraper can submit URLs and get concurrent.futures.Future objects
+back. One session (and its keep-alive connection pool) is reused for every
+request; `concurrency` caps the number of requests in flight, and every
+request also goes through the per-host ratelimit.RateLimiter.
+"""
+
+import asyncio
+import threading
+from collections import deque
+
+import aiohttp
+
+from ratelimit import RateLimiter, is_challenge
+
+USER_AGENT = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36'
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return None
+
+class HttpFetcher:
+    def __init__(self, concurrency=8, timeout=30, retries=2, rate_limiter=None, profiler=None):
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter or RateLimiter(concurrency=concurrency)
+        # Optional profiler.StageProfiler; gets the latency of every request
+        self.profiler = profiler
+        self.timeout = timeout
+        self.retries = retries
+        self.requests = 0
+        self.failures = 0
+        self._loop = None
+        self._thread = None
+        self._session = None
+        self._semaphore = None
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='http-fetcher', daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self._loop).result()
+        return self
+
+    async def _open(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={'User-Agent': USER_AGENT, 'Accept-Language': 'en-US,en;q=0.9'}
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def _get(self, url):
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                self.requests += 1
+                try:
+                    async with self.rate_limiter.arequest(url) as ticket:
+                        with ticket.timing():
+                            async with self._session.get(url) as response:
+                                html = await response.text()
+                        if self.profiler:
+                            self.profiler.record('http.fetch', ticket.latency)
+                        if is_challenge(html):
+                            # Bot check: the limiter backs off before the retry
+                            ticket.challenged()
+                        elif response.status == 200:
+                            return html
+                        elif response.status in RETRY_STATUSES:
+                            # Throttling and server errors may clear up
+                            ticket.failed(retry_after(response))
+                        else:
+                            # Anything else will not get better
+                            break
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    pass
+                if attempt < self.retries:
+                    await asyncio.sleep(2 ** attempt)
+            self.failures += 1
+            return None
+
+    def submit(self, url):
+        """Future resolving to the page HTML, or None if it could not be fetched"""
+        return asyncio.run_coroutine_threadsafe(self._get(url), self._loop)
+
+    def fetch(self, url):
+        return self.submit(url).result()
+
+    def iter_pages(self, urls, window=None):
+        """Yield the HTML for each URL in order, keeping up to `window` requests in flight"""
+        window = window or self.concurrency * 2
+        urls = iter(urls)
+        pending = deque()
+
+        def fill():
+            while len(pending) < window:
+                try:
+                    pending.append(self.submit(next(urls)))
+                except StopIteration:
+                    return
+
+        try:
+            fill()
+            while pending:
+                html = pending.popleft().result()
+                yield html
+                fill()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _close(self):
+        await self._session.close()
+
+    def close(self):
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
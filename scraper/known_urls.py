@@ -0,0 +1,153 @@
+"""
+Compact sets of listing URLs: KnownUrls holds the ones we already have, for
+incremental scrapes; UrlRegistry the ones claimed for detail fetching in the
+current run; RejectedUrls the ones whose detail page ruled them out, so
+incremental scrapes do not fetch them again either
+
+URLs are normalized and reduced to 64-bit blake2b digests kept in a sorted
+array('Q'), about 8 bytes per listing, so the whole listings table fits in a
+few MB. A 64-bit digest makes a false "known" practically impossible, unlike
+a Bloom filter, which would silently skip some new sales.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+from array import array
+from bisect import bisect_left
+from urllib.parse import urlsplit
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    return f"{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+def url_digest(url):
+    return int.from_bytes(hashlib.blake2b(normalize_url(url).encode('utf-8'), digest_size=8).digest(), 'big')
+
+# Next to the scraped JSON, but not *.json, so populate_db and from_json do not
+# take its lines for listings
+REJECTED_FILE = 'rejected_urls.txt'
+
+class KnownUrls:
+    def __init__(self, urls=()):
+        self._digests = array('Q', sorted({url_digest(url) for url in urls}))
+        # URLs added after loading (e.g. scraped this run); small, so a plain set
+        self._added = set()
+
+    def __contains__(self, url):
+        digest = url_digest(url)
+        if digest in self._added:
+            return True
+        i = bisect_left(self._digests, digest)
+        return i < len(self._digests) and self._digests[i] == digest
+
+    def __len__(self):
+        return len(self._digests) + len(self._added)
+
+    def add(self, url):
+        self._added.add(url_digest(url))
+
+    def all_known(self, urls):
+        urls = list(urls)
+        return bool(urls) and all(url in self for url in urls)
+
+    @classmethod
+    def from_database(cls, conn):
+        """Every url in the listings table, read with a server-side cursor"""
+        with conn.cursor(name='known_urls') as cur:
+            cur.itersize = 20000
+            cur.execute("SELECT url FROM listings")
+            return cls(row[0] for row in cur)
+
+    @classmethod
+    def from_json(cls, json_dir):
+        """Every listing url in scraped JSON output under json_dir"""
+        def urls():
+            for path in glob.glob(os.path.join(json_dir, '**', '*.json'), recursive=True):
+                try:
+                    with open(path) as f:
+                        records = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                if not isinstance(records, list):
+                    continue
+                for record in records:
+                    if isinstance(record, dict) and record.get('url'):
+                        yield record['url']
+        return cls(urls())
+
+    @classmethod
+    def from_rejected(cls, path):
+        """Every url in a RejectedUrls file; empty if there is none yet"""
+        def urls():
+            if not os.path.exists(path):
+                return
+            with open(path) as f:
+                for line in f:
+                    url = line.split('\t', 1)[0].strip()
+                    if url:
+                        yield url
+        return cls(urls())
+
+    def merge(self, other):
+        merged = KnownUrls()
+        merged._digests = array('Q', sorted(set(self._digests) | set(other._digests)))
+        merged._added = self._added | other._added
+        return merged
+
+class RejectedUrls:
+    """
+    Listings rejected at detail time (no VIN, not in the USA), appended as
+    "url<TAB>reason" lines. Delete the file to have them fetched again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # A full (not incremental) run fetches them again; write each one once
+        self._written = KnownUrls.from_rejected(path)
+        self._lock = threading.Lock()
+
+    def add(self, url, reason):
+        with self._lock:
+            if url in self._written:
+                return
+            self._written.add(url)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(f"{url}\t{reason}\n")
+
+class UrlRegistry:
+    """
+    Listing URLs claimed for a detail fetch in this run, shared by every slug
+    and car, so a listing shown under several of them is only fetched once
+    """
+
+    def __init__(self):
+        self._claimed = set()
+        self._lock = threading.Lock()
+        self.avoided = 0
+
+    def claim(self, url):
+        """True if url is new to the run; False (and counted) if it was already claimed"""
+        digest = url_digest(url)
+        with self._lock:
+            if digest in self._claimed:
+                self.avoided += 1
+                return False
+            self._claimed.add(digest)
+            return True
+
+    def add(self, url):
+        """Mark url as fetched already (e.g. restored from a checkpoint) without counting it"""
+        with self._lock:
+            self._claimed.add(url_digest(url))
+
+    def release(self, url):
+        """Give up a claim (the fetch failed or never ran) so a later slug may fetch url"""
+        with self._lock:
+            self._claimed.discard(url_digest(url))
+
+    def __len__(self):
+        return len(self._claimed)
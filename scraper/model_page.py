@@ -0,0 +1,398 @@
+"""
+Model-page scraping logic that does not depend on how pages are fetched
+
+ModelPageScraper turns listing cards and detail dicts into output records:
+year/modified filters, variant extraction, the record layout, missing-field
+tracking and de-duplication across slugs. Subclasses supply the pages:
+BATSeleniumScraper fetches them live, reparse.CachedPageScraper reads them
+from the page cache. Nothing here imports Selenium.
+"""
+
+from abc import ABC, abstractmethod
+
+import extract
+from known_urls import UrlRegistry
+from profiler import StageProfiler
+
+class ModelPageScraper(ABC):
+    def __init__(self, slugs, make, model_full, model_short, min_year=None, max_year=None, max_listings=4, on_listing=None, known_urls=None, journal=None, profiler=None, registry=None, rejected=None):
+        self.base_url = "https://bringatrailer.com/"
+        self.slugs = slugs if isinstance(slugs, list) else [slugs]
+        self.make = make
+        self.model_full = model_full
+        self.model_short = model_short
+        self.min_year = min_year
+        self.max_year = max_year
+        self.max_listings = max_listings
+        self.max_clicks = 1
+        # Called with each finished listing record (e.g. pipeline.DatabaseWriter.put)
+        self.on_listing = on_listing
+        # Incremental mode: known_urls.KnownUrls of listings we already have;
+        # their detail pages are not fetched again
+        self.known_urls = known_urls
+        self.known_skipped = 0
+        # checkpoint.CarJournal: finished listings are journaled, and skipped on resume
+        self.journal = journal
+        self.restored = 0
+        # profiler.StageProfiler timing every page load, wait and parse of the run
+        self.profiler = profiler or StageProfiler()
+        # known_urls.UrlRegistry of listings claimed for a detail fetch; pass one
+        # in to dedupe across cars as well as across this scraper's slugs
+        self.registry = registry if registry is not None else UrlRegistry()
+        self.duplicates_skipped = 0
+        # known_urls.RejectedUrls: listings ruled out by their detail page are
+        # recorded there, and later incremental runs load them as known
+        self.rejected = rejected
+    
+    def is_known(self, url):
+        return self.known_urls is not None and url in self.known_urls
+    
+    def all_known(self, urls):
+        return self.known_urls is not None and self.known_urls.all_known(urls)
+    
+    @abstractmethod
+    def load_model_cards(self, url, max_clicks):
+        """Parsed listing cards (parsers.iter_cards dicts) for a model page"""
+    
+    @abstractmethod
+    def iter_listing_details(self, candidates):
+        """Detail dict for each candidate card, in order"""
+    
+    def print_fetch_summary(self):
+        pass
+    
+    def run_report(self, **extra):
+        """profiler.StageProfiler report for this scraper's run, with its counters"""
+        extra.setdefault('slugs', self.slugs)
+        extra.setdefault('known_skipped', self.known_skipped)
+        extra.setdefault('restored', self.restored)
+        extra.setdefault('detail_fetches_avoided', self.duplicates_skipped)
+        return self.profiler.report(**extra)
+    
+    def extract_variant_from_title(self, title):
+        """
+        Extract variant from title using model_short.
+        Pattern: {make} {model_short}{variant}
+        
+        Handles cases like:
+        - "2005 Mitsubishi Lancer Evolution VIII MR" -> variant = "MR"
+        - "2002 Mercedes-Benz CLK55 AMG Coupe" -> variant = "55 AMG Coupe"
+        - "1995 Toyota Supra Turbo 6-Speed" -> variant = "Turbo" (ignores transmission)
+        
+        Returns "Standard" if no variant found.
+        """
+        try:
+            title_upper = title.upper()
+            make_upper = self.make.upper()
+            model_short_upper = self.model_short.upper()
+            
+            make_index = title_upper.find(make_upper)
+            if make_index == -1:
+                return "Standard"
+            
+            after_make = title[make_index + len(self.make):].strip()
+            model_index = after_make.upper().find(model_short_upper)
+            
+            if model_index == -1:
+                return "Standard"
+            
+            after_model = after_make[model_index + len(self.model_short):].strip()
+            
+            if not after_model:
+                return "Standard"
+            
+            transmission_match = extract.TRANSMISSION_IN_TITLE.search(after_model)
+            if transmission_match:
+                variant_end = transmission_match.start()
+                variant = after_model[:variant_end].strip()
+            else:
+                variant = after_model.strip()
+            
+            if not variant:
+                return "Standard"
+            
+            variant_parts = variant.split()
+            if variant_parts:
+                first_word = variant_parts[0]
+                common_words = ['for', 'with', 'in', 'at', 'by', 'from', 'on', 'and', 'the']
+                if first_word.lower() in common_words:
+                    return "Standard"
+            
+            return variant
+            
+        except Exception as e:
+            print(f"    Error extracting variant: {e}")
+            return "Standard"
+    
+    def keep_card(self, listing_data):
+        """
+        Apply the modified/year filters to a parsed card and add make, model
+        and variant to it. False if the listing should be skipped.
+        """
+        # Skip modified cars
+        if 'modified' in listing_data['title'].lower():
+            return False
+        
+        if self.min_year and listing_data.get('year'):
+            if listing_data['year'] < self.min_year:
+                return False
+        
+        if self.max_year and listing_data.get('year'):
+            if listing_data['year'] > self.max_year:
+                return False
+        
+        if 'year' in listing_data:
+            year = listing_data.pop('year')
+            listing_data['year'] = year
+            listing_data['make'] = self.make
+            listing_data['model'] = self.model_full
+        
+        variant = self.extract_variant_from_title(listing_data['title'])
+        listing_data['variant'] = variant
+        return True
+    
+    def listing_record(self, listing_data, detail_data):
+        """Output record for a kept card and its detail dict"""
+        # Determine result (sold vs reserve not met)
+        result = 'Sold' if listing_data.get('price') else 'Reserve Not Met'
+        
+        return {
+            'url': listing_data.get('url') or 'N/A',
+            'source': listing_data.get('source') or 'N/A',
+            'lot_number': detail_data.get('lot_number') or 'N/A',
+            'seller': detail_data.get('seller') or 'N/A',
+            'seller_type': detail_data.get('seller_type') or 'N/A',
+            'result': result,
+            'high_bidder': detail_data.get('high_bidder') or 'N/A',
+            'price': listing_data.get('price'),
+            'sale_date': listing_data.get('sale_date') or 'N/A',
+            'number_of_bids': detail_data.get('number_of_bids'),
+            'title': listing_data.get('title') or 'N/A',
+            'vin': detail_data.get('vin') or 'N/A',
+            'year': listing_data.get('year'),
+            'make': listing_data.get('make') or 'N/A',
+            'model': listing_data.get('model') or 'N/A',
+            'variant': listing_data.get('variant') or 'N/A',
+            'engine': detail_data.get('engine') or 'N/A',
+            'transmission': detail_data.get('transmission') or 'N/A',
+            'exterior_color': detail_data.get('exterior_color') or 'N/A',
+            'interior_color': detail_data.get('interior_color') or 'N/A',
+            'mileage': detail_data.get('mileage') or listing_data.get('mileage'),
+            'location': detail_data.get('location') or 'N/A',
+            'listing_details': detail_data.get('listing_details') or []
+        }
+    
+    def get_model_page(self, url, max_clicks, scrape_details=True):
+        listings = self.load_model_cards(url, max_clicks)
+        parsed = []
+        skipped = 0
+        
+        # Track missing fields
+        missing_fields = {
+            'vin': 0,
+            'lot_number': 0,
+            'seller': 0,
+            'seller_type': 0,
+            'high_bidder': 0,
+            'engine': 0,
+            'transmission': 0,
+            'exterior_color': 0,
+            'interior_color': 0,
+            'mileage': 0,
+            'location': 0,
+            'number_of_bids': 0,
+            'listing_details': 0
+        }
+        
+        candidates = []
+        known = 0
+        duplicates = 0
+        for listing_data in listings:
+            if self.is_known(listing_data['url']):
+                known += 1
+                continue
+            
+            if not self.keep_card(listing_data):
+                skipped += 1
+                continue
+            
+            if not scrape_details:
+                parsed.append(listing_data)
+                if (len(parsed) == self.max_listings):
+                    return parsed
+                continue
+            
+            # Listed under another slug or car already scraped this run
+            if not self.registry.claim(listing_data['url']):
+                duplicates += 1
+                continue
+            
+            candidates.append(listing_data)
+        
+        self.known_skipped += known
+        if known:
+            print(f"  {known} listings already known, not re-scraped")
+        self.duplicates_skipped += duplicates
+        if duplicates:
+            print(f"  {duplicates} listings already scraped this run under another slug or car, not fetched again")
+        
+        if not scrape_details:
+            return parsed
+        
+        # Listings finished before an interrupted run was resumed keep their
+        # journaled outcome; only the rest are fetched
+        finished = {}
+        if self.journal:
+            for listing_data in candidates:
+                done, record = self.journal.outcome(url, listing_data['url'])
+                if done:
+                    finished[listing_data['url']] = record
+            if finished:
+                self.restored += len(finished)
+                print(f"  {len(finished)} listings restored from the checkpoint journal")
+        to_fetch = [listing_data for listing_data in candidates if listing_data['url'] not in finished]
+        
+        # Cards are already parsed, so detail pages can be fetched in any browser
+        # and in parallel; results still come back in card order
+        details = self.iter_listing_details(to_fetch)
+        processed = 0
+        try:
+            for i, listing_data in enumerate(candidates, 1):
+                processed = i
+                if i % 10 == 0 or i == 1:
+                    print(f"  Scraping details: {i}/{self.max_listings}")
+                
+                if listing_data['url'] in finished:
+                    record = finished[listing_data['url']]
+                    if record is None:
+                        skipped += 1
+                        continue
+                    parsed.append(record)
+                    if (len(parsed) == self.max_listings):
+                        break
+                    continue
+                
+                detail_data = next(details, None)
+                if detail_data is None:
+                    self.registry.release(listing_data['url'])
+                    break
+                if not detail_data:
+                    # Failed fetch: let a later slug or car try this listing
+                    self.registry.release(listing_data['url'])
+                
+                # Skip non-USA listings
+                if detail_data.get('country') and detail_data['country'] != 'USA':
+                    skipped += 1
+                    print(f"    Skipped (non-USA): {listing_data['title'][:50]}... ({detail_data['country']})")
+                    if self.journal:
+                        self.journal.record_rejected(url, listing_data['url'])
+                    if self.rejected:
+                        self.rejected.add(listing_data['url'], 'non-USA')
+                    continue
+                
+                ordered_data = self.listing_record(listing_data, detail_data)
+                
+                # Track missing fields (N/A or None values)
+                for field in missing_fields.keys():
+                    if field in ordered_data:
+                        value = ordered_data[field]
+                        if value == 'N/A' or value is None or (isinstance(value, list) and len(value) == 0):
+                            missing_fields[field] += 1
+                
+                if 'vin' not in ordered_data or ordered_data['vin'] == 'N/A' or not ordered_data['vin']:
+                    skipped += 1
+                    print(f"    Skipped (no VIN): {listing_data['title'][:50]}...")
+                    # An empty detail dict is a failed fetch; leave it to be retried on resume
+                    if self.journal and detail_data:
+                        self.journal.record_rejected(url, listing_data['url'])
+                    if self.rejected and detail_data:
+                        self.rejected.add(listing_data['url'], 'no VIN')
+                    continue
+                
+                if self.journal:
+                    self.journal.record_listing(url, listing_data['url'], ordered_data)
+                parsed.append(ordered_data)
+                if self.on_listing:
+                    self.on_listing(ordered_data)
+                if (len(parsed) == self.max_listings):
+                    break
+        finally:
+            details.close()
+            # Candidates never reached (max_listings hit, or an error) stay fetchable
+            for listing_data in candidates[processed:]:
+                self.registry.release(listing_data['url'])
+        
+        print(f"  Completed detail scraping for {len(listings)} listings")
+        print(f"  Skipped {skipped} listings (no VIN, non-USA, modified, or outside year range)")
+        print(f"  Kept {len(parsed)} car listings")
+        
+        # Print missing fields summary
+        if len(parsed) > 0:
+            print(f"\n{'='*70}")
+            print("MISSING FIELDS SUMMARY")
+            print(f"{'='*70}")
+            print(f"Total listings scraped: {len(parsed)}")
+            print()
+            
+            # Sort by number of missing (highest first)
+            sorted_missing = sorted(missing_fields.items(), key=lambda x: x[1], reverse=True)
+            
+            for field, count in sorted_missing:
+                if count > 0:
+                    percentage = (count / len(parsed)) * 100
+                    print(f"  {field:20} : {count:3} missing ({percentage:5.1f}%)")
+            
+            # Show which fields are complete
+            complete_fields = [field for field, count in sorted_missing if count == 0]
+            if complete_fields:
+                print(f"\n  Complete fields (100%): {', '.join(complete_fields)}")
+            
+            print(f"{'='*70}\n")
+        
+        self.print_fetch_summary()
+        
+        return parsed
+    
+    def scrape_all_slugs(self):
+        """
+        Scrape listings from all slugs and combine them
+        """
+        all_listings = []
+        
+        for i, slug in enumerate(self.slugs, 1):
+            print(f"\n{'='*70}")
+            print(f"Scraping slug {i}/{len(self.slugs)}: {slug}")
+            print(f"{'='*70}\n")
+            
+            url = self.base_url + slug + "/"
+            if self.journal and self.journal.page_done(url):
+                listings = self.journal.records(url)
+                self.restored += len(listings)
+                # Fetched before the interruption: other slugs and cars must not fetch them again
+                for listing_url in self.journal.urls(url):
+                    self.registry.add(listing_url)
+                print(f"  Finished before the interruption: {len(listings)} listings restored from the checkpoint journal")
+            else:
+                listings = self.get_model_page(url, max_clicks=self.max_clicks, scrape_details=True)
+                # No listings may mean the model page failed to load; fetch it again on resume
+                if self.journal and listings:
+                    self.journal.mark_page_done(url)
+            all_listings.extend(listings)
+        
+        seen_urls = set()
+        unique_listings = []
+        for listing in all_listings:
+            if listing['url'] not in seen_urls:
+                seen_urls.add(listing['url'])
+                unique_listings.append(listing)
+        
+        print(f"\n{'='*70}")
+        print(f"Combined {len(all_listings)} listings from {len(self.slugs)} slug(s)")
+        print(f"Removed {len(all_listings) - len(unique_listings)} duplicates")
+        print(f"Final count: {len(unique_listings)} unique listings")
+        print(f"{'='*70}\n")
+        
+        return unique_listings
+    
+    def close(self):
+        pass
@@ -0,0 +1,108 @@
+"""
+Content-addressed on-disk cache of fetched HTML pages
+
+Page bodies are gzip-compressed and stored once per distinct content under
+objects/<sha[:2]>/<sha>.html.gz; index.jsonl records every fetch as
+{url, kind, fetched_at, sha}. Re-fetching an unchanged page only appends an
+index line, and the history of a listing's page is kept by fetch time.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+DEFAULT_CACHE_DIR = os.path.join('data', 'cache', 'pages')
+
+class PageCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self._lock = threading.Lock()
+        self._latest = None
+
+    def _object_path(self, sha):
+        return os.path.join(self.root, 'objects', sha[:2], f"{sha}.html.gz")
+
+    def put(self, url, html, kind):
+        """Store one fetch of url ('model' or 'detail' page)"""
+        body = html.encode('utf-8')
+        sha = hashlib.sha256(body).hexdigest()
+        path = self._object_path(sha)
+        entry = {
+            'url': url,
+            'kind': kind,
+            'fetched_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'sha': sha
+        }
+
+        with self._lock:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with gzip.open(tmp_path, 'wb', compresslevel=6) as f:
+                    f.write(body)
+                os.replace(tmp_path, path)
+
+            os.makedirs(self.root, exist_ok=True)
+            with open(self.index_path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+            if self._latest is not None:
+                self._latest[url] = entry
+
+    def _load_index(self):
+        latest = {}
+        try:
+            with open(self.index_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn last line from an interrupted run
+                        continue
+                    # Lines are appended in fetch order, so later ones win
+                    latest[entry['url']] = entry
+        except FileNotFoundError:
+            pass
+        return latest
+
+    def latest_entry(self, url):
+        with self._lock:
+            if self._latest is None:
+                self._latest = self._load_index()
+            return self._latest.get(url)
+
+    def get(self, url):
+        """HTML of the most recent fetch of url, or None if it was never cached"""
+        entry = self.latest_entry(url)
+        if entry is None:
+            return None
+        try:
+            with gzip.open(self._object_path(entry['sha']), 'rb') as f:
+                return f.read().decode('utf-8')
+        except OSError:
+            return None
+
+    def history(self, url):
+        """Every cached fetch of url as (fetched_at, sha), oldest first"""
+        fetches = []
+        try:
+            with open(self.index_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry['url'] == url:
+                        fetches.append((entry['fetched_at'], entry['sha']))
+        except FileNotFoundError:
+            pass
+        return fetches
+
+    def __len__(self):
+        with self._lock:
+            if self._latest is None:
+                self._latest = self._load_index()
+            return len(self._latest)
@@ -0,0 +1,319 @@
+"""
+HTML parsers shared by the Selenium and HTTP fetch backends
+
+Everything here works on page HTML only, so it does not matter whether the
+page came from driver.page_source or a plain HTTP response.
+"""
+
+import io
+import json
+from collections import namedtuple
+
+import lxml.html
+from lxml import etree
+
+import extract
+
+# Fields every detail dict carries, with the value used when the page lacks them
+DETAIL_DEFAULTS = {
+    'transmission': 'N/A',
+    'engine': 'N/A',
+    'exterior_color': 'N/A',
+    'interior_color': 'N/A',
+    'seller': 'N/A',
+    'seller_type': 'N/A',
+    'lot_number': 'N/A',
+    'high_bidder': 'N/A',
+    'location': 'N/A',
+    'vin': 'N/A',
+    'mileage': None,
+    'number_of_bids': None,
+    'listing_details': []
+}
+
+def _class_xpath(name):
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Compiled once; each is a single pass over the parsed tree
+_CARD_RESULTS = etree.XPath(f"(.//div[{_class_xpath('item-results')}])[1]")
+_CARD_EXCERPT = etree.XPath(f"(.//div[{_class_xpath('item-excerpt')}])[1]")
+_COUNTRY = etree.XPath(f"//*[{_class_xpath('show-country-name')}]")
+_ESSENTIALS_STRONGS = etree.XPath(f"(//*[{_class_xpath('essentials')}])[1]//strong")
+_STAT_ROWS = etree.XPath(f"//*[@id='listing-bid']//*[{_class_xpath('listing-stats-stat')}]")
+_STAT_LABEL = etree.XPath(f".//*[{_class_xpath('listing-stats-label')}]")
+_STAT_VALUE = etree.XPath(f".//*[{_class_xpath('listing-stats-value')}]")
+_COMMENTS = etree.XPath("//*[@id='comments']")
+_BID_LINKS = etree.XPath(f".//a[{_class_xpath('bid-notification-link')}]")
+_EMBEDDED_SCRIPTS = etree.XPath("//script[not(@src)][contains(., 'comments_initial')]")
+
+# Listing pages embed the full comment thread, bids included, in an inline
+# script (`var BAT_VMS = {..., "comments_initial": [...]}`) that the Knockout
+# view-model renders from; only part of it is in the DOM until "load more"
+EMBEDDED_COMMENTS_KEY = '"comments_initial"'
+
+# One comment from embedded page data or the view-model
+Comment = namedtuple('Comment', ['author', 'text', 'is_bid', 'amount'])
+
+def fill_detail_defaults(detail_data):
+    for field, default in DETAIL_DEFAULTS.items():
+        if field not in detail_data:
+            detail_data[field] = list(default) if isinstance(default, list) else default
+    return detail_data
+
+def _stripped_text(elem):
+    """Text of elem's strings, each stripped and joined (BeautifulSoup's get_text(strip=True))"""
+    return ''.join(part.strip() for part in elem.itertext())
+
+def _card_data(card):
+    title_elem = card.find('.//h3')
+    if title_elem is None:
+        title_elem = card.find('.//h2')
+    title = _stripped_text(title_elem) if title_elem is not None else None
+    url = card.get('href')
+    if not (title and url):
+        return None
+    if not url.startswith('http'):
+        url = f"https://bringatrailer.com{url}"
+
+    data = {
+        'url': url,
+        'source': 'bringatrailer',
+        'title': title
+    }
+
+    extract.TITLE.extract(title, into=data)
+
+    results = _CARD_RESULTS(card)
+    if results:
+        extract.CARD_RESULTS.extract(_stripped_text(results[0]), into=data)
+
+    if 'mileage' not in data:
+        excerpt = _CARD_EXCERPT(card)
+        if excerpt:
+            extract.EXCERPT.extract(''.join(excerpt[0].itertext()), into=data)
+
+    return data
+
+def iter_cards(html):
+    """
+    Parsed listing dicts for every listing card on a results page, in page order.
+
+    Streams the page through lxml's HTML iterparse and handles each card as
+    soon as its closing tag is seen, then frees it, so large show-more pages
+    are parsed once and never held in memory as a whole tree or as per-card
+    HTML strings.
+    """
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    for _, elem in etree.iterparse(io.BytesIO(html), events=('end',), tag='a', html=True, encoding='utf-8'):
+        if 'listing-card' not in (elem.get('class') or '').split():
+            continue
+        data = _card_data(elem)
+        # Drop the card and everything before it from the partial tree
+        elem.clear(keep_tail=False)
+        parent = elem.getparent()
+        while parent is not None and elem.getprevious() is not None:
+            del parent[0]
+        if data:
+            yield data
+
+def parse_listing_details(items, detail_data):
+    """
+    Fields from the "Listing Details" bullet list. `items` is a list of
+    (text, link_text) pairs, link_text being the text of the item's first link.
+    """
+    detail_data['listing_details'] = [text for text, _ in items if text]
+
+    for idx, (text, link_text) in enumerate(items):
+        rule = extract.detail_item_rule(text, detail_data)
+        if rule is None:
+            continue
+
+        if rule.field == 'vin' and link_text is not None:
+            # The chassis number is usually a link; trust it when it has VIN length
+            if len(link_text) == 17:
+                detail_data['vin'] = link_text
+            continue
+
+        value = extract.detail_item_value(rule, text)
+        if value is None:
+            continue
+        detail_data[rule.field] = value
+
+        if rule.field == 'exterior_color':
+            # The next item should be interior color
+            if idx + 1 < len(items) and items[idx + 1][0]:
+                detail_data['interior_color'] = items[idx + 1][0]
+
+def find_high_bidder(bids, sale_price):
+    """
+    bids is a list of (bidder, comment_text) in page order. With a sale price,
+    the bidder whose bid matches it; otherwise the last bidder.
+    """
+    if not bids:
+        return None
+    if not sale_price:
+        return bids[-1][0] or None
+
+    for bidder, comment_text in reversed(bids):
+        if bidder and bid_amount(comment_text) == sale_price:
+            return bidder
+    return None
+
+def bid_amount(value):
+    """Bid in dollars from an embedded amount (number or "1,921,000") or a bid comment's text"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    if not value:
+        return None
+    digits = value.replace(',', '').replace('$', '').strip()
+    if digits.isdigit():
+        return int(digits)
+    return extract.BID_AMOUNT.extract(value).get('amount')
+
+def normalize_comments(items):
+    """
+    Comment tuples from the comment dicts embedded in the page (and given back
+    by ko.toJS on the comments view-model): authorName, content (HTML), type
+    ('bat-bid' for bids) and bidAmount.
+    """
+    comments = []
+    for item in items or []:
+        if not isinstance(item, dict):
+            continue
+        content = str(item.get('content') or '')
+        if '<' in content:
+            content = lxml.html.fragment_fromstring(content, create_parent='div').text_content()
+        text = ' '.join(content.split())
+        is_bid = item.get('type') == 'bat-bid'
+        amount = None
+        if is_bid:
+            amount = bid_amount(item.get('bidAmount'))
+            if amount is None:
+                amount = bid_amount(text)
+        comments.append(Comment(item.get('authorName') or None, text, is_bid, amount))
+    return comments
+
+def embedded_comments(tree):
+    """Comments embedded in the listing page's inline scripts, or None if there are none"""
+    decoder = json.JSONDecoder()
+    for script in _EMBEDDED_SCRIPTS(tree):
+        text = script.text or ''
+        start = text.find(EMBEDDED_COMMENTS_KEY)
+        if start == -1:
+            continue
+        start = text.find('[', start + len(EMBEDDED_COMMENTS_KEY))
+        try:
+            items, _ = decoder.raw_decode(text, start)
+        except ValueError:
+            continue
+        if isinstance(items, list):
+            return normalize_comments(items)
+    return None
+
+def apply_comments(comments, sale_price, detail_data):
+    """
+    High bidder and bid count from the complete comment thread: the bid
+    matching sale_price, else the highest bid.
+    """
+    bids = [comment for comment in comments if comment.is_bid and comment.author]
+    high_bidder = find_high_bidder([(bid.author, bid.amount) for bid in bids], sale_price) if sale_price else None
+    if not high_bidder and bids:
+        # Bid order in the data is not guaranteed; the highest bid is the high bidder
+        high_bidder = max(bids, key=lambda bid: bid.amount or 0).author
+    if high_bidder:
+        detail_data['high_bidder'] = high_bidder
+    if bids and detail_data.get('number_of_bids') is None:
+        detail_data['number_of_bids'] = len(bids)
+
+def _node_text(elem):
+    """lxml element text with whitespace collapsed, like WebElement.text"""
+    return ' '.join(elem.text_content().split())
+
+def parse_detail(html, sale_price=None, bidder_fallback=True):
+    """
+    detail_data dict for a listing page, as scrape_listing_detail returns it.
+
+    One lxml parse of the page HTML (e.g. driver.page_source) replaces the
+    per-element WebDriver calls. With bidder_fallback=False the high bidder is
+    only set from a bid matching sale_price (or the last bid without one), so
+    the caller can load more comments and try again.
+
+    When the page embeds its comment thread (see embedded_comments), bids come
+    from that instead, with no need to load more.
+    """
+    tree = lxml.html.fromstring(html)
+    detail_data = {}
+
+    country = _COUNTRY(tree)
+    detail_data['country'] = _node_text(country[0]) if country else None
+
+    for strong in _ESSENTIALS_STRONGS(tree):
+        label = _node_text(strong)
+        parent = strong.getparent()
+
+        if label == 'Location':
+            for link in parent.iter('a'):
+                if 'google.com/maps' in link.get('href', ''):
+                    detail_data['location'] = _node_text(link)
+                    break
+
+        elif label == 'Seller':
+            for link in parent.iter('a'):
+                if 'bringatrailer.com/member/' in link.get('href', ''):
+                    detail_data['seller'] = _node_text(link)
+                    break
+
+        elif label == 'Private Party or Dealer':
+            # Format is "Private Party or Dealer: Private Party"
+            parent_text = _node_text(parent)
+            if ':' in parent_text:
+                value = parent_text.split(':', 1)[1].strip()
+                if value in ['Private Party', 'Dealer']:
+                    detail_data['seller_type'] = value
+
+        elif label == 'Lot':
+            extract.LOT.extract(_node_text(parent), into=detail_data)
+
+        elif label == 'Listing Details':
+            ul = parent.find('.//ul')
+            if ul is not None:
+                items = []
+                for li in ul.iter('li'):
+                    link = li.find('.//a')
+                    items.append((_node_text(li), _node_text(link) if link is not None else None))
+                parse_listing_details(items, detail_data)
+
+    for row in _STAT_ROWS(tree):
+        label = _STAT_LABEL(row)
+        value = _STAT_VALUE(row)
+        if label and value and 'bids' in _node_text(label[0]).lower():
+            number = extract.FIRST_NUMBER.extract(_node_text(value[0])).get('number')
+            if number is not None:
+                detail_data['number_of_bids'] = number
+
+    comments = embedded_comments(tree)
+    if comments is not None:
+        detail_data['comments_source'] = 'embedded'
+        apply_comments(comments, sale_price, detail_data)
+        return fill_detail_defaults(detail_data)
+
+    comment_stream = _COMMENTS(tree)
+    if comment_stream:
+        detail_data['comments_source'] = 'dom'
+        comment_stream = comment_stream[0]
+        bids = []
+        for link in _BID_LINKS(comment_stream):
+            # The link's grandparent is the comment text holding the bid amount
+            comment_text = link.getparent()
+            if comment_text is not None and comment_text.getparent() is not None:
+                comment_text = comment_text.getparent()
+            bids.append((_node_text(link), _node_text(comment_text if comment_text is not None else link)))
+        high_bidder = find_high_bidder(bids, sale_price)
+        if not high_bidder and bidder_fallback:
+            # Fallback: the last "bid placed by" anywhere in the thread
+            high_bidder = extract.BID_THREAD.extract(_node_text(comment_stream)).get('high_bidder')
+        if high_bidder:
+            detail_data['high_bidder'] = high_bidder
+
+    return fill_detail_defaults(detail_data)
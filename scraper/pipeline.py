@@ -0,0 +1,110 @@
+"""
+Direct scraper -> database pipeline
+
+The scraper hands every finished listing record to DatabaseWriter.put(), which
+puts it on a bounded queue. A writer thread drains the queue into Postgres in
+small batches (reusing populate_db's batch ingest), so records become visible
+in the API as soon as they are scraped and a crash only loses the last batch.
+When the queue is full, put() blocks and the scraper waits for the database.
+"""
+
+import queue
+import threading
+import time
+
+import populate_db
+
+_STOP = object()
+
+class DatabaseWriter:
+    def __init__(self, maxsize=200, batch_size=10, flush_interval=2.0, bulk=True):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.bulk = bulk
+        self.totals = {'listings': 0, 'inserted': 0, 'updated': 0, 'unchanged': 0, 'errors': 0}
+        self.model_ids = set()
+        self._thread = None
+        self._conn = None
+        self._resolver = None
+    
+    def start(self):
+        # A daemon so a crashed run cannot hang on exit; callers close() in a
+        # finally block, or whatever is still queued is lost
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+        return self
+    
+    def put(self, record):
+        self.queue.put(record)
+    
+    def close(self):
+        """Flush what is queued and stop the writer thread"""
+        if self._thread is None:
+            return self.totals
+        self.queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+        return self.totals
+    
+    def _connect(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = populate_db.get_db_connection()
+            populate_db.require_content_hash_column(self._conn)
+            self._resolver = populate_db.DimensionResolver(self._conn)
+    
+    def _flush(self, batch):
+        try:
+            self._connect()
+            inserted, updated, unchanged, errors, model_ids = populate_db.ingest_batch(
+                self._conn, batch, self._resolver, self.bulk
+            )
+            if model_ids:
+                # Let the API drop and re-warm its cached responses for these models now
+                populate_db.notify_ingest_complete(self._conn, model_ids)
+        except Exception as e:
+            print(f"  [db-writer] Batch of {len(batch)} failed: {e}")
+            if self._conn is not None:
+                try:
+                    self._conn.rollback()
+                except Exception:
+                    self._conn = None
+            inserted, updated, unchanged, errors, model_ids = 0, 0, 0, len(batch), []
+        
+        self.totals['listings'] += len(batch)
+        self.totals['inserted'] += inserted
+        self.totals['updated'] += updated
+        self.totals['unchanged'] += unchanged
+        self.totals['errors'] += errors
+        self.model_ids.update(model_ids)
+    
+    def _run(self):
+        batch = []
+        deadline = None
+        
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+            
+            if record is _STOP:
+                if batch:
+                    self._flush(batch)
+                return
+            
+            if record is not None:
+                batch.append(record)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            
+            # Flush on size, or when the oldest queued record has waited long enough
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
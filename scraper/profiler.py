@@ -0,0 +1,116 @@
+"""
+Per-stage timings for scrape runs
+
+Scrapers time each stage (page load, waits, show-more clicks, detail fetch,
+parse, comment expansion) with StageProfiler.stage(), optionally attributed
+to the listing URL it was for. The run report has count, total, p50 and p95
+per stage plus the per-listing breakdown, and is appended as one JSON line
+per run to a .runs.jsonl file next to the output, so runs can be compared.
+"""
+
+import contextlib
+import json
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+# Stages timed around other stages of the same listing (detail.total wraps
+# detail.load, detail.wait, detail.parse, ...); left out of per-listing totals
+WRAPPER_STAGES = frozenset(['detail.total'])
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+def report_path(output_path):
+    """data/json/<slug>_data.json -> data/json/<slug>_data.runs.jsonl"""
+    root, _ = os.path.splitext(output_path)
+    return f"{root}.runs.jsonl"
+
+class StageProfiler:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        # url -> stage -> seconds spent on that listing
+        self.listings = defaultdict(lambda: defaultdict(float))
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name, listing=None):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started, listing)
+
+    def record(self, name, seconds, listing=None):
+        with self._lock:
+            self.samples[name].append(seconds)
+            if listing:
+                self.listings[listing][name] += seconds
+
+    def add_samples(self, name, durations):
+        """Timings collected elsewhere, e.g. PageWaiter.timings"""
+        with self._lock:
+            self.samples[name].extend(durations)
+
+    def summary(self):
+        with self._lock:
+            samples = {name: sorted(durations) for name, durations in self.samples.items() if durations}
+        rows = []
+        for name, ordered in sorted(samples.items()):
+            rows.append({
+                'stage': name,
+                'count': len(ordered),
+                'total': sum(ordered),
+                'p50': percentile(ordered, 0.50),
+                'p95': percentile(ordered, 0.95),
+                'max': ordered[-1]
+            })
+        return rows
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        print(f"\n{'='*70}")
+        print("STAGE TIMINGS")
+        print(f"{'='*70}")
+        for row in sorted(rows, key=lambda row: row['total'], reverse=True):
+            print(
+                f"  {row['stage']:22} : {row['count']:5} x, {row['total']:8.1f}s total, "
+                f"p50 {row['p50']:6.2f}s, p95 {row['p95']:6.2f}s, max {row['max']:6.2f}s"
+            )
+        print(f"{'='*70}\n")
+
+    def report(self, **extra):
+        with self._lock:
+            listings = [
+                {
+                    'url': url,
+                    'total': sum(seconds for name, seconds in stages.items() if name not in WRAPPER_STAGES),
+                    'stages': dict(stages)
+                }
+                for url, stages in self.listings.items()
+            ]
+        report = {
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'wall_seconds': time.perf_counter() - self._started,
+            'stages': self.summary(),
+            'listings': listings
+        }
+        report.update(extra)
+        return report
+
+    def write_report(self, path, report=None):
+        """Append a run report (by default this one's) to `path`, one JSON line per run"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a') as f:
+            f.write(json.dumps(report or self.report()) + '\n')
+        return path
@@ -0,0 +1,200 @@
+"""
+Adaptive per-host rate limiting for every page load
+
+Each host gets a token bucket (requests per second, with a small burst) and a
+cap on requests in flight. The bucket rate adapts to how the site responds:
+it is cut on slow responses, errors and challenge pages, and recovers step by
+step towards the configured rate while responses are fast and clean.
+
+Browser loads, show-more and comment clicks use the synchronous request()
+context manager; HttpFetcher uses the async arequest(). The block times the
+response itself with ticket.timing() (driver.get or the HTTP fetch), so waits
+for the page to settle afterwards are not counted as a slow response. Blocks
+that time nothing (show-more and comment clicks) only report errors and
+challenges.
+
+Both paths take the same per-host slots, so browsers and HttpFetcher together
+never have more than `concurrency` requests in flight to one host.
+"""
+
+import asyncio
+import contextlib
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Titles/body markers of bot-check interstitials (Cloudflare and similar)
+CHALLENGE_MARKERS = ('just a moment', 'attention required', 'verify you are human', 'cf-challenge')
+
+def is_challenge(text):
+    """True if a page title or HTML looks like a bot-check page rather than content"""
+    if not text:
+        return False
+    head = text[:4000].lower()
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+def host_of(url):
+    return urlsplit(url).netloc.lower()
+
+class Ticket:
+    """Outcome of one rate-limited request; the block marks failures on it"""
+
+    def __init__(self):
+        self.error = False
+        self.challenge = False
+        self.retry_after = None
+        self.latency = None
+
+    @contextlib.contextmanager
+    def timing(self):
+        """Time the response (not the whole block) for the slow-response check"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latency = time.perf_counter() - started
+
+    def failed(self, retry_after=None):
+        self.error = True
+        self.retry_after = retry_after
+
+    def challenged(self):
+        self.challenge = True
+
+class HostBucket:
+    def __init__(self, rate, burst, concurrency, min_rate, slow_seconds):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.min_rate = min_rate
+        self.slow_seconds = slow_seconds
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.slots = threading.BoundedSemaphore(concurrency)
+        self.stats = {'requests': 0, 'slow': 0, 'errors': 0, 'challenges': 0, 'waited': 0.0}
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token; returns how long to wait before sending the request"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Tokens may go negative: later callers queue up behind earlier ones
+            self.tokens -= 1
+            wait = max(0.0, -self.tokens / self.rate, self.paused_until - now)
+            self.stats['requests'] += 1
+            self.stats['waited'] += wait
+            return wait
+
+    def feedback(self, latency, ticket):
+        with self._lock:
+            if ticket.challenge:
+                # A bot check: slow right down and stop for a while
+                self.stats['challenges'] += 1
+                self.rate = max(self.min_rate, self.rate / 4)
+                self.pause(30)
+            elif ticket.error:
+                self.stats['errors'] += 1
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.pause(ticket.retry_after or 1 / self.rate)
+            elif latency is not None and latency > self.slow_seconds:
+                self.stats['slow'] += 1
+                self.rate = max(self.min_rate, self.rate * 0.7)
+            else:
+                # Additive increase back towards the configured rate
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire_slot(self):
+        """Take a slot from a coroutine without blocking the event loop"""
+        delay = 0.005
+        while not self.slots.acquire(blocking=False):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+class RateLimiter:
+    """
+    Token bucket per host. `rate` is the ceiling in requests per second,
+    `concurrency` the requests in flight per host; `limits` overrides both
+    for given hosts as {host: (rate, concurrency)}.
+    """
+
+    def __init__(self, rate=4.0, burst=None, concurrency=8, min_rate=0.1, slow_seconds=8.0, limits=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.concurrency = concurrency
+        self.min_rate = min_rate
+        self.slow_seconds = slow_seconds
+        self.limits = limits or {}
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url):
+        host = host_of(url)
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                rate, concurrency = self.limits.get(host, (self.rate, self.concurrency))
+                bucket = HostBucket(rate, self.burst, concurrency, min(self.min_rate, rate), self.slow_seconds)
+                self._buckets[host] = bucket
+            return bucket
+
+    @contextlib.contextmanager
+    def request(self, url):
+        """Hold a slot and a token for one request to url's host (blocking)"""
+        bucket = self.bucket(url)
+        with bucket.slots:
+            wait = bucket.reserve()
+            if wait:
+                time.sleep(wait)
+            ticket = Ticket()
+            try:
+                yield ticket
+            except Exception:
+                ticket.failed()
+                raise
+            finally:
+                bucket.feedback(ticket.latency, ticket)
+
+    @contextlib.asynccontextmanager
+    async def arequest(self, url):
+        """request() for coroutines on one event loop (e.g. HttpFetcher's)"""
+        bucket = self.bucket(url)
+        await bucket.acquire_slot()
+        try:
+            wait = bucket.reserve()
+            if wait:
+                await asyncio.sleep(wait)
+            ticket = Ticket()
+            try:
+                yield ticket
+            except Exception:
+                ticket.failed()
+                raise
+            finally:
+                bucket.feedback(ticket.latency, ticket)
+        finally:
+            bucket.slots.release()
+
+    def summary(self):
+        with self._lock:
+            buckets = sorted(self._buckets.items())
+        return [dict(bucket.stats, host=host, rate=bucket.rate, max_rate=bucket.max_rate) for host, bucket in buckets]
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        print("Rate limiting per host:")
+        for row in rows:
+            print(
+                f"  {row['host']:28} {row['requests']:5} requests, waited {row['waited']:6.1f}s, "
+                f"{row['slow']} slow, {row['errors']} errors, {row['challenges']} challenges, "
+                f"rate now {row['rate']:.2f}/s (max {row['max_rate']:.2f}/s)"
+            )
+        print()
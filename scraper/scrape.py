@@ -3,7 +3,10 @@ import json
 import argparse
 from datetime import datetime
 
-from bat_scraper import BATSeleniumScraper
+from page_cache import PageCache, DEFAULT_CACHE_DIR
+from checkpoint import RunJournal, DEFAULT_JOURNAL_PATH
+from known_urls import REJECTED_FILE, RejectedUrls, UrlRegistry
+from profiler import report_path
 
 """
 Scrapes individual listings for a make and model, saves to JSON in /data
@@ -12,8 +15,44 @@ Usage:
     python3 scrape.py --slug "slr-mclaren" --make "Mercedes-Benz" --model-full "SLR McLaren" --model-short "SLR McLaren "
     python3 scrape.py --slug "997-gt3" --make "Porsche" --model-full "911 997 GT3" --model-short "911 GT3 " --min-year 2007 --max-year 2012
     python3 scrape.py --json cars_test.json
+    python3 scrape.py --json cars_test.json --pipeline          # also stream each listing into Postgres
+    python3 scrape.py --json cars_test.json --pipeline --no-json
+    python3 scrape.py --json cars_test.json --fetch http --http-concurrency 8
+    python3 scrape.py --json cars_test.json --reparse          # rebuild JSON from cached pages, offline
+    python3 scrape.py --json cars_test.json --incremental      # only scrape sales we do not have yet
+    python3 scrape.py --json cars_test.json --resume           # continue a run that crashed or was stopped
+    python3 scrape.py --json cars_test.json --fresh            # start over, discarding an interrupted run
 """
 
+def load_known_urls(source, json_dir='data/json'):
+    """KnownUrls from the listings table, prior JSON output, or both"""
+    from known_urls import KnownUrls
+    
+    known = KnownUrls()
+    if source in ('json', 'both'):
+        known = known.merge(KnownUrls.from_json(json_dir))
+        print(f"Known listings from {json_dir}: {len(known)}")
+    if source in ('db', 'both'):
+        try:
+            import populate_db
+            conn = populate_db.get_db_connection()
+            try:
+                from_db = KnownUrls.from_database(conn)
+            finally:
+                conn.close()
+            print(f"Known listings from database: {len(from_db)}")
+            known = known.merge(from_db)
+        except Exception as e:
+            if source == 'db':
+                raise
+            print(f"Could not read known listings from the database ({e}); using JSON only")
+    
+    rejected = KnownUrls.from_rejected(os.path.join(json_dir, REJECTED_FILE))
+    if len(rejected):
+        print(f"Listings rejected by earlier runs (no VIN or non-USA): {len(rejected)}")
+        known = known.merge(rejected)
+    return known
+
 def normalize_car_config(car):
     """
     Normalize car configuration from JSON, handling case-insensitive keys
@@ -55,9 +94,40 @@ if __name__ == '__main__':
     parser.add_argument('--max-year', type=int, help='Maximum model year to include')
     parser.add_argument('--max-listings', type=int, default=100, help='Maximum listings to scrape per slug')
     parser.add_argument('--headless', action='store_true', help='Run in headless mode')
+    parser.add_argument('--detail-workers', type=int, default=1, help='Browsers fetching listing detail pages in parallel')
+    parser.add_argument('--fetch', choices=['selenium', 'http'], default='selenium',
+                        help='Page fetch backend; http uses pooled async requests and only falls back to the browser for show-more')
+    parser.add_argument('--http-concurrency', type=int, default=8, help='With --fetch http, requests in flight at once')
+    parser.add_argument('--rps', type=float, default=4.0,
+                        help='Most requests per second to one host; slowed automatically on slow responses, errors or bot checks')
+    parser.add_argument('--host-concurrency', type=int, default=8, help='Most requests in flight to one host')
+    parser.add_argument('--block', choices=['off', 'assets', 'all'], default='all',
+                        help='Resources browsers do not fetch: assets = images, media and fonts; all = assets and ad/analytics hosts')
+    parser.add_argument('--block-allow', nargs='+', default=[], metavar='PAGE:CATEGORY',
+                        help='Per-page-type exceptions, e.g. detail:images (page types: model, detail)')
+    parser.add_argument('--recycle-pages', type=int, default=300, help='Restart a browser after this many page loads')
     parser.add_argument('--json', help='Path to JSON file containing array of car objects')
+    parser.add_argument('--pipeline', action='store_true', help='Write each listing to the database (DATABASE_URL) as soon as it is scraped')
+    parser.add_argument('--no-json', action='store_true', help='With --pipeline, skip writing data/json/<slug>_data.json')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Skip listings we already have and stop show-more at the first all-known page')
+    parser.add_argument('--known-from', choices=['db', 'json', 'both'], default='both',
+                        help='With --incremental, where known listing URLs come from')
+    parser.add_argument('--checkpoint', default=DEFAULT_JOURNAL_PATH, help='Journal of finished listings and pages')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the run recorded in the checkpoint journal without re-fetching finished pages')
+    parser.add_argument('--fresh', action='store_true',
+                        help='Start over even if the checkpoint journal holds an interrupted run, discarding it')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR, help='Compressed page cache for fetched HTML')
+    parser.add_argument('--no-cache', action='store_true', help='Do not store fetched pages in the page cache')
+    parser.add_argument('--reparse', action='store_true',
+                        help='Rebuild the JSON output from cached pages only: no browser, no network')
     
     args = parser.parse_args()
+    if args.resume and args.fresh:
+        parser.error("--resume and --fresh are mutually exclusive")
+    if args.no_json and not args.pipeline:
+        parser.error("--no-json needs --pipeline, otherwise nothing is written")
     
     cars_to_scrape = []
     
@@ -84,84 +154,205 @@ if __name__ == '__main__':
     
     print(f"\nTotal cars to scrape: {len(cars_to_scrape)}\n")
     
-    for idx, car_config in enumerate(cars_to_scrape, 1):
-        print("=" * 70)
-        print(f"[{idx}/{len(cars_to_scrape)}] BringATrailer Scraper - {car_config['make']} {car_config['model_full']}")
-        print("=" * 70)
-        print(f"Slugs: {', '.join(car_config['slugs'])}")
-        if car_config['min_year']:
-            print(f"Year range: {car_config['min_year']}-{car_config['max_year'] or 'present'}")
-        print()
-
-        scraper = BATSeleniumScraper(
-            slugs=car_config['slugs'],
-            make=car_config['make'],
-            model_full=car_config['model_full'],
-            model_short=car_config['model_short'],
-            min_year=car_config['min_year'],
-            max_year=car_config['max_year'],
-            headless=args.headless
-        )
-        
+    db_writer = None
+    if args.pipeline:
+        from pipeline import DatabaseWriter
+        db_writer = DatabaseWriter().start()
+        print("Pipeline mode: listings are written to the database as they are scraped\n")
+    
+    known_urls = None
+    if args.incremental and not args.reparse:
+        known_urls = load_known_urls(args.known_from)
+        print(f"Incremental mode: {len(known_urls)} known listings\n")
+    
+    journal = None
+    if not args.reparse:
         try:
-            listings = scraper.scrape_all_slugs()
-            scraper.close()
+            journal = RunJournal(args.checkpoint, resume=args.resume, fresh=args.fresh)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.resume:
+            print(f"Resuming from {args.checkpoint}: {journal.restored} finished listings journaled\n")
+    
+    # Listings claimed for a detail fetch by any car so far: a listing shown under
+    # several slugs or cars is fetched once, for the first of them
+    registry = UrlRegistry()
+    rejected = RejectedUrls(os.path.join('data/json', REJECTED_FILE))
+    
+    session = None
+    if args.reparse:
+        # Imports nothing from Selenium
+        from reparse import CachedPageScraper
+        page_cache = PageCache(args.cache_dir)
+        print(f"Re-parse mode: {len(page_cache)} cached pages in {args.cache_dir}\n")
+    else:
+        from bat_scraper import BATSeleniumScraper
+        from browser import BrowserSession, blocking_profile
+        from ratelimit import RateLimiter
+        rate_limiter = RateLimiter(rate=args.rps, concurrency=args.host_concurrency)
+        page_cache = None if args.no_cache else PageCache(args.cache_dir)
+        
+        # One set of warm browsers for every car: the main browser plus one per detail worker
+        session = BrowserSession(
+            headless=args.headless,
+            keep=1 + (args.detail_workers if args.detail_workers > 1 else 0),
+            max_pages=args.recycle_pages,
+            blocking=blocking_profile(args.block, args.block_allow)
+        )
+    
+    # Flush the pipeline writer even when a car raises or the run is interrupted:
+    # its thread is a daemon and would drop whatever is still queued
+    try:
+        for idx, car_config in enumerate(cars_to_scrape, 1):
+            car_key = car_config['slugs'][0]
+            if journal and journal.car_done(car_key):
+                for listing_url in journal.urls(car_key):
+                    registry.add(listing_url)
+                print(f"[{idx}/{len(cars_to_scrape)}] {car_config['make']} {car_config['model_full']}: finished before the interruption, skipping\n")
+                continue
             
-            if listings:
-                print(f"\n{'='*70}")
-                print(f"Successfully scraped {len(listings)} {car_config['model_full']} listings")
-                print(f"{'='*70}\n")
+            print("=" * 70)
+            print(f"[{idx}/{len(cars_to_scrape)}] BringATrailer Scraper - {car_config['make']} {car_config['model_full']}")
+            print("=" * 70)
+            print(f"Slugs: {', '.join(car_config['slugs'])}")
+            if car_config['min_year']:
+                print(f"Year range: {car_config['min_year']}-{car_config['max_year'] or 'present'}")
+            print()
+
+            car_args = dict(
+                slugs=car_config['slugs'],
+                make=car_config['make'],
+                model_full=car_config['model_full'],
+                model_short=car_config['model_short'],
+                min_year=car_config['min_year'],
+                max_year=car_config['max_year'],
+                on_listing=db_writer.put if db_writer else None,
+                registry=registry,
+                rejected=rejected
+            )
+            if args.reparse:
+                scraper = CachedPageScraper(page_cache, **car_args)
+            else:
+                scraper = BATSeleniumScraper(
+                    **car_args,
+                    headless=args.headless,
+                    detail_workers=args.detail_workers,
+                    session=session,
+                    fetch=args.fetch,
+                    http_concurrency=args.http_concurrency,
+                    page_cache=page_cache,
+                    known_urls=known_urls,
+                    journal=journal.car(car_key) if journal else None,
+                    rate_limiter=rate_limiter
+                )
+            
+            run_error = None
+            scraped = 0
+            try:
+                listings = scraper.scrape_all_slugs()
+                scraped = len(listings)
+                scraper.close()
                 
-                sold = [l for l in listings if 'price' in l]
-                if sold:
-                    prices = [l['price'] for l in sold]
+                if listings:
+                    print(f"\n{'='*70}")
+                    print(f"Successfully scraped {len(listings)} {car_config['model_full']} listings")
+                    print(f"{'='*70}\n")
                     
-                    print("SUMMARY STATISTICS:")
-                    print(f"  Total listings: {len(listings)}")
-                    print(f"  Listings with price data: {len(sold)}")
-                    print(f"  Average sale price: ${sum(prices)/len(prices):,.0f}")
-                    print(f"  Price range: ${min(prices):,} - ${max(prices):,}")
+                    sold = [l for l in listings if 'price' in l]
+                    if sold:
+                        prices = [l['price'] for l in sold]
+                        
+                        print("SUMMARY STATISTICS:")
+                        print(f"  Total listings: {len(listings)}")
+                        print(f"  Listings with price data: {len(sold)}")
+                        print(f"  Average sale price: ${sum(prices)/len(prices):,.0f}")
+                        print(f"  Price range: ${min(prices):,} - ${max(prices):,}")
 
-                    years = {}
-                    for listing in sold:
-                        if 'year' in listing:
-                            year = listing['year']
-                            years[year] = years.get(year, 0) + 1
-                    
-                    if years:
-                        print(f"\n  Sales by year:")
-                        for year in sorted(years.keys()):
-                            print(f"    {year}: {years[year]} listing(s)")
+                        years = {}
+                        for listing in sold:
+                            if 'year' in listing:
+                                year = listing['year']
+                                years[year] = years.get(year, 0) + 1
+                        
+                        if years:
+                            print(f"\n  Sales by year:")
+                            for year in sorted(years.keys()):
+                                print(f"    {year}: {years[year]} listing(s)")
+                        
+                        variants = {}
+                        for listing in sold:
+                            if 'variant' in listing:
+                                variant = listing['variant']
+                                variants[variant] = variants.get(variant, 0) + 1
+                        
+                        if variants:
+                            print(f"\n  Sales by variant:")
+                            for variant in sorted(variants.keys()):
+                                print(f"    {variant}: {variants[variant]} listing(s)")
+                        
+                        print(f"\n{'='*70}")
                     
-                    variants = {}
-                    for listing in sold:
-                        if 'variant' in listing:
-                            variant = listing['variant']
-                            variants[variant] = variants.get(variant, 0) + 1
+                    if not args.no_json:
+                        model_slug = car_config['slugs'][0]
+                        output_path = f"data/json/{model_slug}_data.json"
+                        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                        
+                        if known_urls is not None and os.path.exists(output_path):
+                            # Only new sales were scraped; keep the earlier ones after them
+                            with open(output_path) as f:
+                                previous = json.load(f)
+                            scraped_urls = {listing['url'] for listing in listings}
+                            listings = listings + [l for l in previous if l.get('url') not in scraped_urls]
+                        
+                        with open(output_path, "w") as f:
+                            json.dump(listings, f, indent=4)
+                        
+                        print(f"\nSaved {len(listings)} listings to {output_path}")
+                    print("Done\n")
                     
-                    if variants:
-                        print(f"\n  Sales by variant:")
-                        for variant in sorted(variants.keys()):
-                            print(f"    {variant}: {variants[variant]} listing(s)")
-                    
-                    print(f"\n{'='*70}")
-                
-                model_slug = car_config['slugs'][0]
-                output_path = f"data/json/{model_slug}_data.json"
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                
-                with open(output_path, "w") as f:
-                    json.dump(listings, f, indent=4)
+                else:
+                    print("\nNo listings found\n")
                 
-                print(f"\nSaved {len(listings)} listings to {output_path}")
-                print("Done\n")
-                
-            else:
-                print("\nNo listings found\n")
+                if journal:
+                    journal.mark_car_done(car_key)
+            
+            except Exception as e:
+                run_error = str(e)
+                print(f"\nError scraping {car_config['make']} {car_config['model_full']}: {e}\n")
+                try:
+                    scraper.close()
+                except:
+                    pass
+            
+            # Where the time went, appended to a per-model history of runs next to the output
+            scraper.profiler.print_summary()
+            profile_path = report_path(f"data/json/{car_config['slugs'][0]}_data.json")
+            scraper.profiler.write_report(profile_path, scraper.run_report(
+                make=car_config['make'],
+                model=car_config['model_full'],
+                kept=scraped,
+                error=run_error
+            ))
+            print(f"Run report appended to {profile_path}\n")
         
-        except Exception as e:
-            print(f"\nError scraping {car_config['make']} {car_config['model_full']}: {e}\n")
-            try:
-                scraper.close()
-            except:
-                pass
\ No newline at end of file
+        if registry.avoided:
+            print(f"Deduplication: {registry.avoided} detail fetches avoided for listings under several slugs or cars\n")
+        
+        if session:
+            session.close()
+        
+        if journal:
+            if all(journal.car_done(car_config['slugs'][0]) for car_config in cars_to_scrape):
+                journal.finish()
+            journal.close()
+    finally:
+        if db_writer:
+            totals = db_writer.close()
+            print("=" * 70)
+            print("PIPELINE DATABASE SUMMARY")
+            print("=" * 70)
+            print(f"  Inserted: {totals['inserted']} new listings")
+            print(f"  Updated: {totals['updated']} existing listings")
+            print(f"  Unchanged: {totals['unchanged']} listings skipped")
+            print(f"  Errors: {totals['errors']}")
+            print()
\ No newline at end of file
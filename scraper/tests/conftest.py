@@ -0,0 +1,23 @@
+import glob
+import os
+import sys
+
+import pytest
+
+SCRAPER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# The scraper modules import each other as top-level modules
+sys.path.insert(0, SCRAPER_DIR)
+
+def listing_fixtures():
+    return sorted(glob.glob(os.path.join(FIXTURES_DIR, 'listing_*.html')))
+
+def read_fixture(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+@pytest.fixture(params=listing_fixtures(), ids=lambda path: os.path.basename(path))
+def listing_page(request):
+    """(path, html) of each saved listing page"""
+    return request.param, read_fixture(request.param)
@@ -0,0 +1,43 @@
+"""
+The checkpoint journal of an interrupted run survives a plain rerun
+"""
+
+import pytest
+
+from checkpoint import RunJournal, unfinished_run
+
+def interrupted(path):
+    journal = RunJournal(path)
+    journal.car('porsche-911').record_listing('https://bringatrailer.com/porsche-911/', 'u1', {'url': 'u1'})
+    journal.close()
+
+def test_plain_rerun_refuses_an_interrupted_journal(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    interrupted(path)
+    assert unfinished_run(path)
+    with pytest.raises(ValueError):
+        RunJournal(path)
+    # Still resumable
+    journal = RunJournal(path, resume=True)
+    assert journal.restored == 1
+    journal.close()
+
+def test_fresh_discards_an_interrupted_journal(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    interrupted(path)
+    journal = RunJournal(path, fresh=True)
+    journal.close()
+    assert not unfinished_run(path)
+    journal = RunJournal(path, resume=True)
+    assert journal.restored == 0
+    journal.close()
+
+def test_finished_run_can_be_overwritten(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    interrupted(path)
+    journal = RunJournal(path, resume=True)
+    journal.mark_car_done('porsche-911')
+    journal.finish()
+    journal.close()
+    assert not unfinished_run(path)
+    RunJournal(path).close()
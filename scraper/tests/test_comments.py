@@ -0,0 +1,58 @@
+"""
+Bids and comments read from the thread embedded in listing pages
+(BAT_VMS.comments_initial) instead of clicking "load more"
+"""
+
+import os
+
+import lxml.html
+
+import parsers
+from conftest import FIXTURES_DIR, read_fixture
+
+def fixture(name):
+    return read_fixture(os.path.join(FIXTURES_DIR, name))
+
+def test_embedded_thread_is_read_in_full():
+    comments = parsers.embedded_comments(lxml.html.fromstring(fixture('listing_db9.html')))
+    assert [comment.author for comment in comments] == [
+        'astonowner', 'dbfan', 'lowballer', 'v12grand', 'dbfan', 'v12grand', 'dbfan'
+    ]
+    bids = [(comment.author, comment.amount) for comment in comments if comment.is_bid]
+    assert bids == [('lowballer', 30000), ('v12grand', 38000), ('dbfan', 40000), ('v12grand', 41500)]
+    assert comments[0].text == 'Happy to answer questions. Service records since 2010 are in the gallery.'
+    assert comments[-1].text == 'Well bought & congrats!'
+    assert not comments[0].is_bid and comments[0].amount is None
+
+def test_parse_detail_takes_bids_from_embedded_thread():
+    # Only a non-bid comment is in the DOM; the winning bid is only in the embedded data
+    detail_data = parsers.parse_detail(fixture('listing_db9.html'), sale_price=41500)
+    assert detail_data['comments_source'] == 'embedded'
+    assert detail_data['high_bidder'] == 'v12grand'
+    # The page has no Bids stat, so the count comes from the thread
+    assert detail_data['number_of_bids'] == 4
+
+def test_unmatched_sale_price_falls_back_to_highest_bid():
+    detail_data = parsers.parse_detail(fixture('listing_db9.html'), sale_price=39000)
+    assert detail_data['high_bidder'] == 'v12grand'
+
+def test_bids_stat_wins_over_thread_count():
+    html = fixture('listing_db9.html').replace(
+        '<tr class="listing-stats-stat"><td class="listing-stats-label">Winning Bid',
+        '<tr class="listing-stats-stat"><td class="listing-stats-label">Bids</td><td class="listing-stats-value">12</td></tr>'
+        '<tr class="listing-stats-stat"><td class="listing-stats-label">Winning Bid'
+    )
+    assert parsers.parse_detail(html, sale_price=41500)['number_of_bids'] == 12
+
+def test_bid_amount_from_text_when_missing():
+    comments = parsers.normalize_comments([
+        {'type': 'bat-bid', 'authorName': 'gt3fan', 'content': '<p>USD $80,000 bid placed by gt3fan</p>'}
+    ])
+    assert comments == [parsers.Comment('gt3fan', 'USD $80,000 bid placed by gt3fan', True, 80000)]
+
+def test_pages_without_embedded_thread_use_the_dom():
+    html = fixture('listing_911_gt3.html')
+    assert parsers.embedded_comments(lxml.html.fromstring(html)) is None
+    detail_data = parsers.parse_detail(html, sale_price=85000)
+    assert detail_data['comments_source'] == 'dom'
+    assert detail_data['high_bidder'] == 'p_carrera'
@@ -0,0 +1,64 @@
+"""
+Run-wide listing URL dedupe across slugs, cars and resumed runs
+"""
+
+from checkpoint import RunJournal
+from known_urls import UrlRegistry
+from model_page import ModelPageScraper
+
+class FakePageScraper(ModelPageScraper):
+    """Model pages from a {slug: [listing urls]} dict; records every detail fetch"""
+
+    def __init__(self, pages, fetched, **kwargs):
+        super().__init__(list(pages), 'Porsche', '911', '911', max_listings=10, **kwargs)
+        self.pages = pages
+        self.fetched = fetched
+
+    def load_model_cards(self, url, max_clicks):
+        slug = url.rstrip('/').rsplit('/', 1)[-1]
+        return [{'url': listing_url, 'title': '2001 Porsche 911', 'year': 2001} for listing_url in self.pages[slug]]
+
+    def iter_listing_details(self, candidates):
+        for listing_data in candidates:
+            self.fetched.append(listing_data['url'])
+            yield {'vin': 'WP0AA29951S620000', 'country': 'USA'}
+
+def test_each_listing_is_fetched_once_per_run():
+    fetched = []
+    registry = UrlRegistry()
+    first = FakePageScraper({'a': ['u1', 'u2'], 'b': ['u2', 'u3']}, fetched, registry=registry)
+    second = FakePageScraper({'c': ['u3', 'u4']}, fetched, registry=registry)
+
+    assert [listing['url'] for listing in first.scrape_all_slugs()] == ['u1', 'u2', 'u3']
+    assert [listing['url'] for listing in second.scrape_all_slugs()] == ['u4']
+    assert fetched == ['u1', 'u2', 'u3', 'u4']
+    assert registry.avoided == 2
+    assert first.run_report()['detail_fetches_avoided'] == 1
+
+def test_failed_fetches_stay_claimable():
+    class FailingScraper(FakePageScraper):
+        def iter_listing_details(self, candidates):
+            for listing_data in candidates:
+                self.fetched.append(listing_data['url'])
+                yield {}
+
+    fetched = []
+    registry = UrlRegistry()
+    FailingScraper({'a': ['u1']}, fetched, registry=registry).scrape_all_slugs()
+    FakePageScraper({'b': ['u1']}, fetched, registry=registry).scrape_all_slugs()
+    assert fetched == ['u1', 'u1']
+    assert registry.avoided == 0
+
+def test_restored_pages_are_claimed(tmp_path):
+    path = str(tmp_path / 'journal.jsonl')
+    journal = RunJournal(path)
+    FakePageScraper({'a': ['u1', 'u2']}, [], journal=journal.car('a')).scrape_all_slugs()
+    journal.close()
+
+    fetched = []
+    registry = UrlRegistry()
+    journal = RunJournal(path, resume=True)
+    FakePageScraper({'a': ['u1', 'u2'], 'b': ['u2', 'u3']}, fetched, journal=journal.car('a'), registry=registry).scrape_all_slugs()
+    journal.close()
+    assert fetched == ['u3']
+    assert registry.avoided == 1
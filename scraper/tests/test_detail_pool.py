@@ -0,0 +1,112 @@
+"""
+DetailWorkerPool restarts crashed browsers through the BrowserSession, so its
+page counts and the BlockingProfile's applied patterns do not keep dead ones
+"""
+
+import pytest
+
+browser = pytest.importorskip('browser')
+from detail_pool import DetailWorkerPool
+from waits import PageWaiter
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+        self.quit_calls = 0
+        self.window_handles = ['main']
+
+    def execute_script(self, script, *args):
+        if not self.alive:
+            raise RuntimeError('session deleted because of page crash')
+        return None
+
+    def execute_cdp_cmd(self, cmd, params):
+        if not self.alive:
+            raise RuntimeError('session deleted because of page crash')
+
+    def delete_all_cookies(self):
+        self.execute_script('')
+
+    def get(self, url):
+        self.execute_script('')
+
+    @property
+    def switch_to(self):
+        return self
+
+    def window(self, handle):
+        pass
+
+    def quit(self):
+        self.quit_calls += 1
+
+class FakeScraper:
+    """The scraper calls DetailWorkerPool makes; crashes the browser on URLs in `crash`"""
+
+    def __init__(self, session, crash=()):
+        self.session = session
+        self.crash = set(crash)
+        self.drivers = []
+        self.waiter = PageWaiter(None)
+
+    def new_driver(self):
+        driver = self.session.acquire()
+        self.drivers.append(driver)
+        return driver
+
+    def release_driver(self, driver):
+        self.session.release(driver)
+
+    def refresh_driver(self, driver):
+        return self.session.recycle_if_needed(driver)
+
+    def scrape_listing_detail(self, url, sale_price=None, driver=None, waiter=None):
+        self.session.blocking.apply(driver, 'detail')
+        if url in self.crash:
+            self.crash.discard(url)
+            driver.alive = False
+            return {}
+        self.session.get(driver, url)
+        return {'url': url}
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(browser, 'create_driver', lambda headless=False, blocking=None: FakeDriver())
+    return browser.BrowserSession(keep=1, blocking=browser.BlockingProfile())
+
+def test_crashed_browser_is_released_through_the_session(session):
+    scraper = FakeScraper(session, crash=['u2'])
+    pool = DetailWorkerPool(scraper, workers=1)
+    try:
+        details = list(pool.iter_details((url, None) for url in ['u1', 'u2', 'u3']))
+    finally:
+        pool.close()
+
+    assert [detail['url'] for detail in details] == ['u1', 'u2', 'u3']
+    assert pool.restarts == 1
+    crashed, replacement = scraper.drivers
+    assert crashed.quit_calls == 1
+    assert id(crashed) not in session._pages
+    assert id(crashed) not in session.blocking._applied
+    # The replacement went back to the session's idle pool
+    assert session._idle == [replacement]
+
+def test_sequential_details_restart_a_crashed_browser(session):
+    BATSeleniumScraper = pytest.importorskip('bat_scraper').BATSeleniumScraper
+
+    class Scraper(BATSeleniumScraper):
+        crash = {'u2'}
+        scrape_listing_detail = FakeScraper.scrape_listing_detail
+
+    scraper = Scraper(['porsche-911'], 'Porsche', '911', '911', session=session)
+    crashed = scraper.driver
+    try:
+        details = list(scraper.iter_listing_details([{'url': url} for url in ['u1', 'u2', 'u3']]))
+        assert [detail['url'] for detail in details] == ['u1', 'u2', 'u3']
+        assert crashed.quit_calls == 1
+        assert id(crashed) not in session._pages
+        # Later details and the scraper itself use the replacement
+        assert scraper.driver is not crashed and scraper.driver.alive
+        assert scraper.waiter.driver is scraper.driver
+    finally:
+        scraper.close()
@@ -0,0 +1,137 @@
+"""
+The extract.py rule tables against the inline regexes they replaced
+
+legacy_* below are the pre-table code from bat_scraper, kept verbatim apart
+from taking plain strings instead of WebElements.
+"""
+
+import glob
+import json
+import os
+import re
+
+import lxml.html
+import pytest
+
+import extract
+import parsers
+from conftest import SCRAPER_DIR
+
+DETAIL_FIELDS = ('vin', 'mileage', 'transmission', 'exterior_color', 'interior_color', 'engine')
+
+def legacy_title_fields(title):
+    data = {}
+    year_match = re.search(r'\b(19|20)\d{2}\b', title)
+    if year_match:
+        data['year'] = int(year_match.group())
+    mileage_match = re.search(r'(\d+\.?\d*)k-Mile', title, re.I)
+    if mileage_match:
+        data['mileage'] = int(float(mileage_match.group(1)) * 1000)
+    return data
+
+def legacy_listing_details(items):
+    """items: (li text, text of the li's first link or None), as the old loop saw them"""
+    detail_data = {}
+    for idx, (text, link_text) in enumerate(items):
+        if 'chassis:' in text.lower():
+            if link_text is not None:
+                if len(link_text) == 17:
+                    detail_data['vin'] = link_text
+            else:
+                vin_match = re.search(r'chassis:\s*([A-HJ-NPR-Z0-9]{17})', text, re.I)
+                if vin_match:
+                    detail_data['vin'] = vin_match.group(1)
+
+        elif 'miles' in text.lower() and 'mileage' not in detail_data:
+            mileage_match = re.search(r'([\d,]+)\s*(?:k\s+)?miles', text, re.I)
+            if mileage_match:
+                mileage_str = mileage_match.group(1).replace(',', '')
+                if 'k' in text.lower():
+                    detail_data['mileage'] = int(float(mileage_str) * 1000)
+                else:
+                    detail_data['mileage'] = int(mileage_str)
+
+        elif 'speed' in text.lower() and 'transmission' not in detail_data:
+            normalized_text = text.replace('‑', '-').replace('–', '-').replace('—', '-')
+            transmission_match = re.search(r'[\w\s-]*\b(\w+)-Speed[\w\s-]*', normalized_text, re.I)
+            if transmission_match:
+                detail_data['transmission'] = transmission_match.group(0).strip()
+
+        elif 'paint' in text.lower() and 'exterior_color' not in detail_data:
+            paint_match = re.search(r'(.+?Paint)', text, re.I)
+            if paint_match:
+                detail_data['exterior_color'] = paint_match.group(1).strip()
+                if idx + 1 < len(items):
+                    next_text = items[idx + 1][0]
+                    if next_text:
+                        detail_data['interior_color'] = next_text
+
+        elif ('liter' in text.lower() or 'L' in text) and 'engine' not in detail_data:
+            normalized_text = text.replace('‑', '-').replace('–', '-').replace('—', '-')
+            engine_match = re.search(r'[\w\s-]*\b(\d+\.?\d*)[- ]?(?:Liter|L)\b[\w\s-]*', normalized_text, re.I)
+            if engine_match:
+                detail_data['engine'] = engine_match.group(0).strip()
+    return detail_data
+
+def page_items(html):
+    """Listing Details bullets of a page as (text, link text) pairs"""
+    tree = lxml.html.fromstring(html)
+    items = []
+    for li in tree.xpath("//*[contains(@class, 'essentials')]//strong[.='Listing Details']/..//ul/li"):
+        link = li.find('.//a')
+        text = ' '.join(li.text_content().split())
+        items.append((text, ' '.join(link.text_content().split()) if link is not None else None))
+    return items
+
+def table_listing_details(items):
+    detail_data = {}
+    parsers.parse_listing_details(items, detail_data)
+    return {field: detail_data[field] for field in DETAIL_FIELDS if field in detail_data}
+
+def test_listing_details_match_inline_regexes(listing_page):
+    _, html = listing_page
+    items = page_items(html)
+    assert items
+    assert table_listing_details(items) == legacy_listing_details(items)
+
+def test_parse_detail_uses_the_tables(listing_page):
+    _, html = listing_page
+    detail_data = parsers.parse_detail(html)
+    legacy = legacy_listing_details(page_items(html))
+    assert {field: detail_data[field] for field in legacy} == legacy
+
+@pytest.mark.parametrize('items', [
+    [('Chassis: WP0AB2A93KS123456', None), ('12k Miles', None), ('Six‑Speed Manual Transmission', None)],
+    [('Chassis: 1G1YY26E585123456', '1G1YY26E585'), ('62,410 Miles', None), ('6.2L LS3 V8', None)],
+    [('Twin-Turbocharged 3.8-Liter Flat-Six', None), ('Seven-Speed PDK Transaxle', None), ('GT Silver Metallic Paint', None), ('', None)],
+    [('Arctic White Paint', None), ('Black Leather Upholstery', None), ('4.2L V8', None), ('Five–Speed Automatic', None)],
+    [('TMU', None), ('3,200 Miles Shown', None), ('98,000 Miles', None)],
+])
+def test_listing_details_edge_cases(items):
+    assert table_listing_details(items) == legacy_listing_details(items)
+
+@pytest.mark.parametrize('text, legacy, mileage', [
+    # The old code multiplied by 1000 whenever the bullet had a "k" anywhere
+    ('12,345 Miles Shown, True Mileage Unknown', 12345000, 12345),
+    # and read only the digits after the decimal point
+    ('12.5k Miles', 5000, 12500),
+])
+def test_mileage_k_only_scales_the_number(text, legacy, mileage):
+    items = [(text, None)]
+    assert legacy_listing_details(items)['mileage'] == legacy
+    assert table_listing_details(items)['mileage'] == mileage
+
+def scraped_titles():
+    titles = []
+    for path in glob.glob(os.path.join(SCRAPER_DIR, 'data', 'json', '**', '*.json'), recursive=True):
+        with open(path) as f:
+            records = json.load(f)
+        if isinstance(records, list):
+            titles.extend(record['title'] for record in records if isinstance(record, dict) and record.get('title'))
+    return titles
+
+def test_title_rules_match_inline_regexes():
+    titles = scraped_titles()
+    assert titles
+    differing = [title for title in titles if extract.TITLE.extract(title) != legacy_title_fields(title)]
+    assert differing == []
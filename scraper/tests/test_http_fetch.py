@@ -0,0 +1,207 @@
+"""
+HttpFetcher against a local HTTP server serving the saved listing pages
+
+Records built from HttpFetcher + parse_detail must equal the ones the
+Selenium path builds from the same page's source. Without a browser here the
+Selenium path runs with PageSourceDriver, which loads the page from the same
+server and exposes it the way Chrome does for these server-rendered pages.
+"""
+
+import os
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from conftest import listing_fixtures, read_fixture
+from http_fetch import HttpFetcher
+from ratelimit import RateLimiter
+
+CHALLENGE_PAGE = '<html><head><title>Just a moment...</title></head><body></body></html>'
+
+# Sale prices as the listing cards give them
+SALE_PRICES = {'listing_911_gt3': 85000, 'listing_slr': 352000, 'listing_db9': 41500}
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FixtureHandler)
+        self.pages = {}
+        for path in listing_fixtures():
+            name = os.path.splitext(os.path.basename(path))[0]
+            self.pages[f"/listing/{name}/"] = read_fixture(path)
+        # path -> statuses to answer with before serving the page
+        self.failures = {}
+        self.hits = {}
+        self._lock = threading.Lock()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        with server._lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            pending = server.failures.get(self.path)
+            status = pending.pop(0) if pending else None
+
+        if self.path == '/challenge/':
+            self.reply(200, CHALLENGE_PAGE)
+        elif status is not None:
+            self.reply(status, 'unavailable', {'Retry-After': '0'})
+        elif self.path in server.pages:
+            self.reply(200, server.pages[self.path])
+        else:
+            self.reply(404, 'not found')
+
+    def reply(self, status, body, headers=None):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = FixtureServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def fetcher():
+    fetcher = HttpFetcher(concurrency=4, timeout=5, retries=2, rate_limiter=RateLimiter(rate=100)).start()
+    yield fetcher
+    fetcher.close()
+
+def candidates(server):
+    return [
+        {'url': server.url(path), 'title': path, 'price': SALE_PRICES[path.split('/')[2]], 'year': 2005}
+        for path in sorted(server.pages)
+    ]
+
+def test_fetch_serves_saved_pages(server, fetcher):
+    for path, html in server.pages.items():
+        assert fetcher.fetch(server.url(path)) == html
+    assert fetcher.failures == 0
+
+def test_iter_pages_keeps_order(server, fetcher):
+    paths = sorted(server.pages) * 3
+    pages = list(fetcher.iter_pages(server.url(path) for path in paths))
+    assert pages == [server.pages[path] for path in paths]
+
+def test_retries_throttled_and_failing_responses(server, fetcher):
+    path = '/listing/listing_slr/'
+    server.failures[path] = [503, 429]
+    assert fetcher.fetch(server.url(path)) == server.pages[path]
+    assert server.hits[path] == 3
+    assert fetcher.failures == 0
+
+    host = fetcher.rate_limiter.summary()[0]
+    assert host['errors'] == 2
+
+def test_gives_up_after_retries(server, fetcher):
+    path = '/listing/listing_db9/'
+    server.failures[path] = [500, 502, 503, 504]
+    assert fetcher.fetch(server.url(path)) is None
+    assert server.hits[path] == fetcher.retries + 1
+    assert fetcher.failures == 1
+
+def test_client_errors_are_not_retried(server, fetcher):
+    assert fetcher.fetch(server.url('/listing/missing/')) is None
+    assert server.hits['/listing/missing/'] == 1
+    assert fetcher.failures == 1
+
+def test_challenge_page_is_not_returned(server):
+    fetcher = HttpFetcher(timeout=5, retries=0, rate_limiter=RateLimiter(rate=100)).start()
+    try:
+        assert fetcher.fetch(server.url('/challenge/')) is None
+        assert fetcher.rate_limiter.summary()[0]['challenges'] == 1
+    finally:
+        fetcher.close()
+
+def test_connection_errors_fail_cleanly(fetcher):
+    # Nothing listens on the port of a closed server
+    closed = FixtureServer()
+    url = closed.url('/listing/listing_slr/')
+    closed.server_close()
+    fetcher.retries = 0
+    assert fetcher.fetch(url) is None
+    assert fetcher.failures == 1
+
+class PageSourceDriver:
+    """The WebDriver calls the detail path makes, answered from the page as served"""
+
+    def __init__(self):
+        self.page_source = ''
+        self.title = ''
+
+    def get(self, url):
+        with urllib.request.urlopen(url, timeout=5) as response:
+            self.page_source = response.read().decode('utf-8')
+        start = self.page_source.find('<title>') + len('<title>')
+        self.title = self.page_source[start:self.page_source.find('</title>')]
+
+    def execute_script(self, script, *args):
+        # No JavaScript: no Knockout view-model to read comments from
+        return None
+
+    def find_element(self, by, value):
+        from selenium.common.exceptions import NoSuchElementException
+        raise NoSuchElementException(value)
+
+class ReadyWaiter:
+    def element(self, *args):
+        return None
+
+def test_http_records_match_selenium_path(server):
+    BATSeleniumScraper = pytest.importorskip('bat_scraper').BATSeleniumScraper
+
+    scraper = BATSeleniumScraper(['porsche-911'], 'Porsche', '911', '911', fetch='http', max_listings=10,
+                                 rate_limiter=RateLimiter(rate=100))
+    try:
+        listings = candidates(server)
+        http_details = list(scraper.iter_listing_details(listings))
+        driver = PageSourceDriver()
+        selenium_details = [
+            scraper._scrape_listing_detail(listing_data['url'], listing_data['price'], driver, ReadyWaiter())
+            for listing_data in listings
+        ]
+    finally:
+        scraper.close()
+
+    assert len(http_details) == len(listings)
+    for listing_data, http_detail, selenium_detail in zip(listings, http_details, selenium_details):
+        assert http_detail['vin'] != 'N/A'
+        assert http_detail['high_bidder'] != 'N/A'
+        assert scraper.listing_record(listing_data, http_detail) == scraper.listing_record(listing_data, selenium_detail)
+    # listing_911_gt3 and listing_slr have no embedded thread, counted on each path
+    assert scraper.without_embedded_comments == 4
+
+def test_http_path_yields_empty_detail_for_failed_pages(server):
+    BATSeleniumScraper = pytest.importorskip('bat_scraper').BATSeleniumScraper
+
+    scraper = BATSeleniumScraper(['porsche-911'], 'Porsche', '911', '911', fetch='http',
+                                 rate_limiter=RateLimiter(rate=100))
+    scraper.http.retries = 0
+    try:
+        listings = [{'url': server.url('/listing/missing/'), 'title': 'missing', 'price': None}] + candidates(server)
+        details = list(scraper.iter_listing_details(listings))
+    finally:
+        scraper.close()
+
+    assert details[0] == {}
+    assert all(detail['vin'] != 'N/A' for detail in details[1:])
@@ -0,0 +1,132 @@
+"""
+JobQueue's claim, backoff and dead-letter logic against a recording fake
+connection, so it runs without a database (test_work_queue.py covers the SQL
+against Postgres)
+"""
+
+import json
+
+import pytest
+
+pytest.importorskip('psycopg2')
+
+import populate_db
+from work_queue import BACKOFF_SECONDS, MAX_BACKOFF_SECONDS, JobQueue, QueueWorker
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = conn.rowcount
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, params=None):
+        self.conn.log.append(('execute', ' '.join(sql.split()), params))
+
+    def fetchone(self):
+        return self.conn.row
+
+class FakeConn:
+    """Answers every query with `row` and `rowcount`; logs executes, commits and rollbacks"""
+
+    def __init__(self, row=None, rowcount=1):
+        self.row = row
+        self.rowcount = rowcount
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.log.append(('commit',))
+
+    def rollback(self):
+        self.log.append(('rollback',))
+
+    def executed(self):
+        return [entry for entry in self.log if entry[0] == 'execute']
+
+def job(attempts, max_attempts=5):
+    return {'id': 7, 'kind': 'detail', 'payload': {}, 'attempts': attempts, 'max_attempts': max_attempts}
+
+def test_claim_leases_the_next_job():
+    conn = FakeConn(row=(7, 'detail', json.dumps({'url': 'u1'}), 1, 5))
+    claimed = JobQueue(conn, 'worker-1', lease_seconds=60).claim(['detail'])
+    assert claimed == {'id': 7, 'kind': 'detail', 'payload': {'url': 'u1'}, 'attempts': 1, 'max_attempts': 5}
+
+    (_, sql, params), = conn.executed()
+    assert 'FOR UPDATE SKIP LOCKED' in sql
+    assert "WHERE status = 'pending' AND available_at <= NOW() AND kind = ANY(%s)" in sql
+    assert params == ('worker-1', 60, ['detail'])
+    # Committed at once, so the lease is visible to other workers
+    assert conn.log[-1] == ('commit',)
+
+def test_claim_returns_none_when_nothing_is_runnable():
+    conn = FakeConn(row=None)
+    assert JobQueue(conn, 'worker-1').claim() is None
+    assert 'kind = ANY' not in conn.executed()[0][1]
+
+@pytest.mark.parametrize('attempts, delay', [
+    (1, BACKOFF_SECONDS),
+    (2, BACKOFF_SECONDS * 2),
+    (3, BACKOFF_SECONDS * 4),
+    (12, MAX_BACKOFF_SECONDS),
+])
+def test_failures_back_off_exponentially(attempts, delay):
+    conn = FakeConn()
+    assert JobQueue(conn, 'worker-1').fail(job(attempts, max_attempts=20), RuntimeError('timeout')) == 'pending'
+    (_, sql, params), = conn.executed()
+    assert params == ('pending', delay, 'timeout', 7, 'worker-1')
+
+def test_last_attempt_is_dead_lettered():
+    conn = FakeConn()
+    assert JobQueue(conn, 'worker-1').fail(job(5, max_attempts=5), RuntimeError('timeout')) == 'dead'
+    (_, sql, params), = conn.executed()
+    assert params[0] == 'dead'
+    # Only the lease holder may fail a running job, and the handler's
+    # half-done transaction is rolled back first
+    assert "WHERE id = %s AND leased_by = %s AND status = 'running'" in sql
+    assert conn.log[0] == ('rollback',) and conn.log[-1] == ('commit',)
+
+def test_complete_commits_only_while_holding_the_lease():
+    held = FakeConn(rowcount=1)
+    assert JobQueue(held, 'worker-1').complete(7)
+    assert held.log[-1] == ('commit',)
+
+    lost = FakeConn(rowcount=0)
+    assert not JobQueue(lost, 'worker-1').complete(7)
+    # The job's writes in this transaction are discarded with it
+    assert lost.log[-1] == ('rollback',)
+
+class FakeScraper:
+    def iter_listing_details(self, candidates):
+        for card in candidates:
+            yield {'vin': 'WP0AA29951S620000', 'country': 'USA'}
+
+    def listing_record(self, card, detail_data):
+        return {'url': card['url'], 'vin': detail_data['vin'], 'make': 'Porsche', 'model': '911'}
+
+class FakeResolver:
+    def make_id(self, make_name):
+        return 1
+
+    def model_id(self, make_id, model_name):
+        return 42
+
+def test_rerun_detail_job_is_written_once_and_still_notifies(monkeypatch):
+    # The first attempt committed the listing and died before complete(); the
+    # re-run's upsert finds it unchanged
+    monkeypatch.setattr(populate_db, 'ingest_batch', lambda conn, batch, resolver: (0, 0, 1, 0, []))
+    worker = QueueWorker('worker-1')
+    worker.conn = FakeConn()
+    worker.resolver = FakeResolver()
+    monkeypatch.setattr(worker, 'scraper_for', lambda car: FakeScraper())
+
+    rerun = dict(job(2), payload={'car': {}, 'card': {'url': 'https://bringatrailer.com/listing/a/'}})
+    worker.run_detail(rerun)
+    assert worker.stats['listings'] == 1
+    assert worker.changed_model_ids == {42}
@@ -0,0 +1,53 @@
+"""
+Listings rejected at detail time are recorded next to the JSON output and
+loaded as known, so incremental runs do not fetch them again
+"""
+
+from known_urls import KnownUrls, RejectedUrls
+from model_page import ModelPageScraper
+
+DETAILS = {
+    'https://bringatrailer.com/listing/kept/': {'vin': 'WP0AA29951S620000', 'country': 'USA'},
+    'https://bringatrailer.com/listing/canada/': {'vin': 'WP0AA29951S620001', 'country': 'Canada'},
+    'https://bringatrailer.com/listing/no-vin/': {'country': 'USA'},
+    # A failed fetch: worth trying again next run
+    'https://bringatrailer.com/listing/failed/': {},
+}
+
+class FakePageScraper(ModelPageScraper):
+    def __init__(self, fetched, **kwargs):
+        super().__init__(['porsche-911'], 'Porsche', '911', '911', max_listings=10, **kwargs)
+        self.fetched = fetched
+
+    def load_model_cards(self, url, max_clicks):
+        return [{'url': listing_url, 'title': '2001 Porsche 911', 'year': 2001} for listing_url in DETAILS]
+
+    def iter_listing_details(self, candidates):
+        for listing_data in candidates:
+            self.fetched.append(listing_data['url'])
+            yield DETAILS[listing_data['url']]
+
+def test_rejected_listings_are_not_fetched_again(tmp_path):
+    path = str(tmp_path / 'rejected_urls.txt')
+    fetched = []
+    kept = FakePageScraper(fetched, rejected=RejectedUrls(path)).scrape_all_slugs()
+    assert [listing['url'] for listing in kept] == ['https://bringatrailer.com/listing/kept/']
+
+    rejected = KnownUrls.from_rejected(path)
+    assert len(rejected) == 2
+    assert 'https://bringatrailer.com/listing/canada' in rejected
+
+    # The next incremental run knows the kept listing from the JSON output
+    known = KnownUrls(['https://bringatrailer.com/listing/kept/']).merge(rejected)
+    fetched.clear()
+    FakePageScraper(fetched, known_urls=known, rejected=RejectedUrls(path)).scrape_all_slugs()
+    assert fetched == ['https://bringatrailer.com/listing/failed/']
+
+def test_rejects_are_written_once(tmp_path):
+    path = tmp_path / 'rejected_urls.txt'
+    RejectedUrls(str(path)).add('https://bringatrailer.com/listing/canada/', 'non-USA')
+    RejectedUrls(str(path)).add('https://bringatrailer.com/listing/canada/', 'non-USA')
+    assert path.read_text() == 'https://bringatrailer.com/listing/canada/\tnon-USA\n'
+
+def test_missing_rejects_file_is_empty(tmp_path):
+    assert len(KnownUrls.from_rejected(str(tmp_path / 'rejected_urls.txt'))) == 0
@@ -0,0 +1,88 @@
+"""
+RateLimiter feedback: only the timed response counts towards the slow check.
+Browser (request) and HTTP (arequest) loads share one per-host concurrency cap
+"""
+
+import asyncio
+import threading
+import time
+
+from ratelimit import RateLimiter
+
+URL = 'https://bringatrailer.com/listing/example/'
+
+def limiter():
+    return RateLimiter(rate=100, slow_seconds=0.05)
+
+def test_waits_after_the_response_are_not_slow():
+    rate_limiter = limiter()
+    with rate_limiter.request(URL) as ticket:
+        with ticket.timing():
+            pass
+        # e.g. PageWaiter waiting for comments to render
+        time.sleep(0.1)
+    assert rate_limiter.summary()[0]['slow'] == 0
+
+def test_untimed_blocks_are_not_slow():
+    rate_limiter = limiter()
+    with rate_limiter.request(URL):
+        time.sleep(0.1)
+    assert rate_limiter.summary()[0]['slow'] == 0
+
+def test_slow_responses_cut_the_rate():
+    rate_limiter = limiter()
+    with rate_limiter.request(URL) as ticket:
+        with ticket.timing():
+            time.sleep(0.1)
+    host = rate_limiter.summary()[0]
+    assert host['slow'] == 1
+    assert host['rate'] < host['max_rate']
+
+def test_errors_in_the_block_count_as_failures():
+    rate_limiter = limiter()
+    try:
+        with rate_limiter.request(URL) as ticket:
+            with ticket.timing():
+                raise TimeoutError('page load timed out')
+    except TimeoutError:
+        pass
+    assert rate_limiter.summary()[0]['errors'] == 1
+
+def test_sync_and_async_requests_share_the_concurrency_cap():
+    rate_limiter = RateLimiter(rate=1000, concurrency=2)
+    lock = threading.Lock()
+    in_flight = [0, 0]
+
+    def enter():
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+
+    def leave():
+        with lock:
+            in_flight[0] -= 1
+
+    def browser_load():
+        with rate_limiter.request(URL):
+            enter()
+            time.sleep(0.05)
+            leave()
+
+    async def http_load():
+        async with rate_limiter.arequest(URL):
+            enter()
+            await asyncio.sleep(0.05)
+            leave()
+
+    async def http_loads():
+        await asyncio.gather(*(http_load() for _ in range(4)))
+
+    threads = [threading.Thread(target=browser_load) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    asyncio.run(http_loads())
+    for thread in threads:
+        thread.join()
+
+    assert in_flight == [0, 2]
+    assert rate_limiter.summary()[0]['requests'] == 8
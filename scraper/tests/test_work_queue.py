@@ -0,0 +1,182 @@
+"""
+The Postgres work queue: exactly-once completion across worker processes,
+lease expiry, and recovery from lost connections
+
+Needs a database: set DATABASE_URL (the tables are created if missing).
+"""
+
+import multiprocessing
+import os
+import time
+import uuid
+
+import pytest
+
+if not os.getenv('DATABASE_URL'):
+    pytest.skip('DATABASE_URL is not set', allow_module_level=True)
+pytest.importorskip('psycopg2')
+
+import populate_db
+from work_queue import Heartbeat, JobQueue, QueueWorker, enqueue, ensure_queue_table
+
+KIND = 'test'
+
+@pytest.fixture
+def conn():
+    conn = populate_db.get_db_connection()
+    ensure_queue_table(conn)
+    yield conn
+    conn.rollback()
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM scrape_jobs WHERE kind = %s", (KIND,))
+    conn.commit()
+    conn.close()
+
+@pytest.fixture
+def jobs(conn):
+    """Enqueue `count` test jobs; returns their ids"""
+    run = uuid.uuid4().hex
+
+    def make(count, max_attempts=5):
+        for index in range(count):
+            enqueue(conn, KIND, {'run': run, 'index': index}, f"{run}:{KIND}:{index}", max_attempts)
+        conn.commit()
+        with conn.cursor() as cur:
+            cur.execute("SELECT id FROM scrape_jobs WHERE dedupe_key LIKE %s ORDER BY id", (f"{run}:%",))
+            rows = cur.fetchall()
+        conn.commit()
+        return [row[0] for row in rows]
+    return make
+
+def job_row(conn, job_id):
+    with conn.cursor() as cur:
+        cur.execute("SELECT status, attempts, leased_by, lease_expires_at, last_error FROM scrape_jobs WHERE id = %s",
+                    (job_id,))
+        row = cur.fetchone()
+    conn.commit()
+    return row
+
+def terminate_backend(conn, pid):
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_terminate_backend(%s)", (pid,))
+    conn.commit()
+
+def drain(worker_id, results):
+    """Worker process: claim and complete test jobs until none are left"""
+    conn = populate_db.get_db_connection()
+    queue = JobQueue(conn, worker_id)
+    completed = []
+    try:
+        while True:
+            job = queue.claim([KIND])
+            if job is None:
+                break
+            # Some work while holding the lease, so claims interleave
+            time.sleep(0.002)
+            if queue.complete(job['id']):
+                completed.append(job['id'])
+    finally:
+        conn.close()
+    results.put(completed)
+
+def test_jobs_complete_exactly_once_across_processes(conn, jobs):
+    job_ids = jobs(300)
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    processes = [context.Process(target=drain, args=(f"test-worker-{index}", results)) for index in range(4)]
+    for process in processes:
+        process.start()
+    completed = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+    done = [job_id for worker in completed for job_id in worker]
+    assert sorted(done) == job_ids
+    # More than one worker got work, and no job was claimed twice
+    assert sum(1 for worker in completed if worker) > 1
+    assert all(job_row(conn, job_id)[:2] == ('done', 1) for job_id in job_ids)
+
+def test_expired_lease_is_reclaimed_and_fenced(conn, jobs):
+    job_id, = jobs(1)
+    stalled = JobQueue(conn, 'test-stalled', lease_seconds=1)
+    assert stalled.claim([KIND])['id'] == job_id
+    time.sleep(1.5)
+
+    other_conn = populate_db.get_db_connection()
+    try:
+        other = JobQueue(other_conn, 'test-other')
+        assert other.reap_expired() >= 1
+        job = other.claim([KIND])
+        assert job['id'] == job_id and job['attempts'] == 2
+        # The stalled worker's late result is discarded
+        assert not stalled.complete(job_id)
+        assert other.complete(job_id)
+    finally:
+        other_conn.close()
+    assert job_row(conn, job_id)[0] == 'done'
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+def heartbeat_backends(conn, exclude):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT pid FROM pg_stat_activity
+            WHERE datname = current_database() AND pid <> ALL(%s) AND backend_type = 'client backend'
+        """, (list(exclude),))
+        pids = [row[0] for row in cur.fetchall()]
+    conn.commit()
+    return pids
+
+def test_heartbeat_reconnects_after_connection_loss(conn, jobs):
+    job_id, = jobs(1)
+    queue = JobQueue(conn, 'test-heartbeat', lease_seconds=30)
+    queue.claim([KIND])
+    before = heartbeat_backends(conn, [conn.get_backend_pid()])
+
+    heartbeat = Heartbeat('test-heartbeat', lease_seconds=30, interval=0.1).start()
+    try:
+        heartbeat.watch(job_id)
+        assert wait_for(lambda: set(heartbeat_backends(conn, [conn.get_backend_pid()])) - set(before))
+        for pid in set(heartbeat_backends(conn, [conn.get_backend_pid()])) - set(before):
+            terminate_backend(conn, pid)
+        expires = job_row(conn, job_id)[3]
+
+        # The next beats reconnect and keep extending the lease
+        assert wait_for(lambda: job_row(conn, job_id)[3] > expires)
+        assert not heartbeat.lost and not heartbeat.failed
+    finally:
+        heartbeat.close()
+
+def test_heartbeat_fails_after_a_lease_without_beats(monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'postgresql://nobody@/nowhere?host=/nonexistent&connect_timeout=1')
+    heartbeat = Heartbeat('test-unreachable', lease_seconds=1, interval=0.1).start()
+    try:
+        heartbeat.watch(1)
+        assert wait_for(lambda: heartbeat.failed)
+        assert heartbeat.lost
+    finally:
+        heartbeat.close()
+
+def test_failure_is_recorded_after_connection_loss(conn, jobs):
+    job_id, = jobs(1)
+    worker = QueueWorker('test-reconnect', lease_seconds=30)
+    worker.connect()
+    try:
+        job = worker.queue.claim([KIND])
+        assert job['id'] == job_id
+        terminate_backend(conn, worker.conn.get_backend_pid())
+
+        # A handler would now fail on the dead connection; recording that must not
+        assert worker.record_failure(job, RuntimeError('page did not load')) == 'pending'
+        status, attempts, leased_by, _, last_error = job_row(conn, job_id)
+        assert (status, attempts, leased_by, last_error) == ('pending', 1, None, 'page did not load')
+        assert worker.stats['retried'] == 1
+    finally:
+        worker.conn.close()
@@ -0,0 +1,90 @@
+"""
+Condition-based waits for BATSeleniumScraper
+
+Every wait returns as soon as its condition holds instead of sleeping for a
+fixed time, and records how long it actually took so runs can show where the
+time goes.
+"""
+
+import time
+from collections import defaultdict
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+
+class PageWaiter:
+    def __init__(self, driver, default_timeout=10, poll_frequency=0.1):
+        self.driver = driver
+        self.default_timeout = default_timeout
+        self.poll_frequency = poll_frequency
+        self.timings = defaultdict(list)
+        self.timeouts = defaultdict(int)
+    
+    def until(self, name, condition, timeout=None):
+        """Wait for condition(driver) to be truthy. Returns its value, or None on timeout."""
+        timeout = self.default_timeout if timeout is None else timeout
+        started = time.perf_counter()
+        try:
+            return WebDriverWait(self.driver, timeout, poll_frequency=self.poll_frequency).until(condition)
+        except TimeoutException:
+            self.timeouts[name] += 1
+            return None
+        finally:
+            self.timings[name].append(time.perf_counter() - started)
+    
+    def page_loaded(self, name='page_load', timeout=None):
+        return self.until(
+            name,
+            lambda d: d.execute_script("return document.readyState") == 'complete',
+            timeout
+        )
+    
+    def element(self, by, value, name, timeout=None):
+        return self.until(name, EC.presence_of_element_located((by, value)), timeout)
+    
+    def count_exceeds(self, by, value, count, name, timeout=None):
+        """Wait until more than `count` elements match, e.g. after loading another page of results"""
+        def more_loaded(driver):
+            found = len(driver.find_elements(by, value))
+            return found if found > count else False
+        return self.until(name, more_loaded, timeout)
+    
+    def comments_changed(self, before, name='comments_load', timeout=None):
+        """Wait until the comment thread has grown past `before` comments"""
+        return self.count_exceeds(By.CSS_SELECTOR, "#comments .comment", before, name, timeout)
+    
+    def absorb(self, other):
+        """Fold another waiter's timings into this one (e.g. from pool workers)"""
+        for name, durations in other.timings.items():
+            self.timings[name].extend(durations)
+        for name, count in other.timeouts.items():
+            self.timeouts[name] += count
+    
+    def summary(self):
+        rows = []
+        for name, durations in sorted(self.timings.items()):
+            rows.append({
+                'wait': name,
+                'count': len(durations),
+                'total': sum(durations),
+                'avg': sum(durations) / len(durations),
+                'max': max(durations),
+                'timeouts': self.timeouts.get(name, 0)
+            })
+        return rows
+    
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        print(f"\n{'='*70}")
+        print("WAIT TIMINGS")
+        print(f"{'='*70}")
+        for row in rows:
+            print(
+                f"  {row['wait']:20} : {row['count']:4} waits, {row['total']:7.1f}s total, "
+                f"{row['avg']:5.2f}s avg, {row['max']:5.2f}s max, {row['timeouts']} timeouts"
+            )
+        print(f"{'='*70}\n")
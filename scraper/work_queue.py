@@ -0,0 +1,631 @@
+"""
+Postgres-backed work queue for scraping from several machines at once
+
+Car configs, model pages (slugs) and listing detail pages are rows in
+scrape_jobs. A car job enqueues one slug job per slug; a slug job loads the
+model page and enqueues a detail job per kept card; a detail job scrapes the
+listing and upserts it into listings. Child jobs are enqueued in the same
+transaction that completes their parent, and dedupe keys make re-enqueueing
+a no-op, so a crash never loses or duplicates work.
+
+A job can run more than once: a worker that dies after a detail job's
+listing is committed but before complete() leaves the job to be reclaimed
+and run again. That is safe because listings are upserted by their unique
+url (an unchanged record is skipped by its content hash), so the re-run
+writes the same row and never adds a second one.
+
+Workers claim the next pending job with FOR UPDATE SKIP LOCKED, so they never
+wait on each other, and hold it under a lease that a heartbeat thread keeps
+extending. A job whose worker died is reclaimed once its lease expires.
+Failed jobs are retried with exponential backoff; after max_attempts they
+stay 'dead' until `retry-dead` puts them back.
+
+Both the worker and its heartbeat reconnect when their database connection
+breaks. A worker whose heartbeats cannot get through for a whole lease stops,
+since other workers may already have reclaimed its job.
+
+Usage:
+    python3 work_queue.py enqueue --json cars_test.json --run 2024-06-01
+    python3 work_queue.py work --workers 4 --headless
+    python3 work_queue.py work --workers 4 --fetch http --exit-when-empty
+    python3 work_queue.py status
+    python3 work_queue.py retry-dead
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from datetime import date
+
+import populate_db
+
+LEASE_SECONDS = 300
+HEARTBEAT_SECONDS = 60
+BACKOFF_SECONDS = 30
+MAX_BACKOFF_SECONDS = 3600
+RECONNECT_ATTEMPTS = 5
+
+# Lower values are claimed first: finish detail pages before opening more model pages
+PRIORITY = {'detail': 0, 'slug': 1, 'car': 2}
+
+def ensure_queue_table(conn):
+    """Create scrape_jobs in databases set up before it was in schema.sql"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS scrape_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                kind VARCHAR(20) NOT NULL,
+                payload JSONB NOT NULL,
+                dedupe_key VARCHAR(700) NOT NULL UNIQUE,
+                priority INTEGER NOT NULL DEFAULT 0,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL DEFAULT 5,
+                available_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                leased_by VARCHAR(100),
+                lease_expires_at TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                finished_at TIMESTAMP
+            )
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_scrape_jobs_claim
+            ON scrape_jobs(priority, available_at, id) WHERE status = 'pending'
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_scrape_jobs_lease
+            ON scrape_jobs(lease_expires_at) WHERE status = 'running'
+        """)
+    conn.commit()
+
+def enqueue(conn, kind, payload, dedupe_key, max_attempts=5):
+    """
+    Add a job unless one with the same dedupe_key exists. Does not commit, so
+    a parent job can enqueue its children and complete in one transaction.
+    Returns True if the job was added.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO scrape_jobs (kind, payload, dedupe_key, priority, max_attempts)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (dedupe_key) DO NOTHING
+            RETURNING id
+        """, (kind, json.dumps(payload), dedupe_key, PRIORITY.get(kind, 0), max_attempts))
+        return cur.fetchone() is not None
+
+def close_quietly(conn):
+    if conn is not None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def car_key(car):
+    return car['slugs'][0]
+
+def enqueue_cars(conn, cars, run, max_attempts=5):
+    added = 0
+    for car in cars:
+        if enqueue(conn, 'car', {'run': run, 'car': car}, f"{run}:car:{car_key(car)}", max_attempts):
+            added += 1
+    conn.commit()
+    return added
+
+class JobQueue:
+    def __init__(self, conn, worker_id, lease_seconds=LEASE_SECONDS):
+        self.conn = conn
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+
+    def claim(self, kinds=None):
+        """
+        The next runnable job as a dict (id, kind, payload, attempts,
+        max_attempts), or None. `kinds` limits it to some job kinds.
+        """
+        kind_filter = "AND kind = ANY(%s)" if kinds else ""
+        params = (self.worker_id, self.lease_seconds) + ((list(kinds),) if kinds else ())
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE scrape_jobs
+                SET status = 'running', leased_by = %s, attempts = attempts + 1,
+                    lease_expires_at = NOW() + %s * INTERVAL '1 second', updated_at = NOW()
+                WHERE id = (
+                    SELECT id FROM scrape_jobs
+                    WHERE status = 'pending' AND available_at <= NOW() {kind_filter}
+                    ORDER BY priority, available_at, id
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING id, kind, payload, attempts, max_attempts
+            """.format(kind_filter=kind_filter), params)
+            row = cur.fetchone()
+        self.conn.commit()
+        if row is None:
+            return None
+        job_id, kind, payload, attempts, max_attempts = row
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        return {'id': job_id, 'kind': kind, 'payload': payload, 'attempts': attempts, 'max_attempts': max_attempts}
+
+    def heartbeat(self, job_id):
+        """Extend the lease on job_id. False if the job is no longer ours."""
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE scrape_jobs
+                SET lease_expires_at = NOW() + %s * INTERVAL '1 second', updated_at = NOW()
+                WHERE id = %s AND leased_by = %s AND status = 'running'
+            """, (self.lease_seconds, job_id, self.worker_id))
+            extended = cur.rowcount == 1
+        self.conn.commit()
+        return extended
+
+    def complete(self, job_id):
+        """
+        Mark job_id done, committing anything else done in the transaction.
+        False (and rolled back) if the lease was lost to another worker.
+        """
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE scrape_jobs
+                SET status = 'done', finished_at = NOW(), updated_at = NOW(),
+                    leased_by = NULL, lease_expires_at = NULL, last_error = NULL
+                WHERE id = %s AND leased_by = %s AND status = 'running'
+            """, (job_id, self.worker_id))
+            completed = cur.rowcount == 1
+        if completed:
+            self.conn.commit()
+        else:
+            self.conn.rollback()
+        return completed
+
+    def fail(self, job, error):
+        """Schedule a retry with exponential backoff, or dead-letter the job. Returns the new status."""
+        self.conn.rollback()
+        dead = job['attempts'] >= job['max_attempts']
+        delay = min(BACKOFF_SECONDS * 2 ** (job['attempts'] - 1), MAX_BACKOFF_SECONDS)
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE scrape_jobs
+                SET status = %s, available_at = NOW() + %s * INTERVAL '1 second', updated_at = NOW(),
+                    leased_by = NULL, lease_expires_at = NULL, last_error = %s
+                WHERE id = %s AND leased_by = %s AND status = 'running'
+            """, ('dead' if dead else 'pending', delay, str(error)[:2000], job['id'], self.worker_id))
+        self.conn.commit()
+        return 'dead' if dead else 'pending'
+
+    def reap_expired(self):
+        """Release jobs whose worker stopped heartbeating. Returns how many were released."""
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE scrape_jobs
+                SET status = CASE WHEN attempts >= max_attempts THEN 'dead' ELSE 'pending' END,
+                    available_at = NOW(), updated_at = NOW(),
+                    leased_by = NULL, lease_expires_at = NULL,
+                    last_error = 'lease expired (worker stopped heartbeating)'
+                WHERE status = 'running' AND lease_expires_at < NOW()
+            """)
+            released = cur.rowcount
+        self.conn.commit()
+        return released
+
+    def outstanding(self):
+        """Jobs that are pending or running, including ones waiting out a backoff"""
+        with self.conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM scrape_jobs WHERE status IN ('pending', 'running')")
+            count = cur.fetchone()[0]
+        self.conn.commit()
+        return count
+
+class Heartbeat:
+    """
+    Extends the lease of the job being worked on, on its own connection. A
+    failed beat drops the connection and the next one reconnects; when no beat
+    has got through for a whole lease, the lease is lost and `failed` is set.
+    """
+
+    def __init__(self, worker_id, lease_seconds=LEASE_SECONDS, interval=HEARTBEAT_SECONDS):
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.interval = interval
+        self.job_id = None
+        self.lost = False
+        self.failed = False
+        self._extended_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='queue-heartbeat', daemon=True)
+        self._thread.start()
+        return self
+
+    def watch(self, job_id):
+        with self._lock:
+            self.job_id = job_id
+            self.lost = False
+            # claim() has just set a full lease
+            self._extended_at = time.monotonic()
+
+    def _run(self):
+        conn = None
+        try:
+            while not self._stop.wait(self.interval):
+                with self._lock:
+                    job_id = self.job_id
+                if job_id is None:
+                    continue
+                try:
+                    if conn is None:
+                        conn = populate_db.get_db_connection()
+                    extended = JobQueue(conn, self.worker_id, self.lease_seconds).heartbeat(job_id)
+                except Exception as e:
+                    print(f"  [{self.worker_id}] Heartbeat failed, reconnecting: {e}")
+                    close_quietly(conn)
+                    conn = None
+                    self._check_expired(job_id)
+                    continue
+                with self._lock:
+                    if self.job_id != job_id:
+                        continue
+                    if extended:
+                        self._extended_at = time.monotonic()
+                    else:
+                        print(f"  [{self.worker_id}] Lost the lease on job {job_id}")
+                        self.lost = True
+        finally:
+            close_quietly(conn)
+
+    def _check_expired(self, job_id):
+        with self._lock:
+            if self.job_id == job_id and time.monotonic() - self._extended_at >= self.lease_seconds:
+                print(f"  [{self.worker_id}] No heartbeat got through for {self.lease_seconds}s; "
+                      f"the lease on job {job_id} has expired")
+                self.lost = True
+                self.failed = True
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+class QueueWorker:
+    """Claims and runs jobs until stopped, with its own BATSeleniumScraper and browser"""
+
+    def __init__(self, worker_id, headless=True, fetch='selenium', http_concurrency=8, max_listings=100,
+                 lease_seconds=LEASE_SECONDS, poll_seconds=5, exit_when_empty=False, kinds=None,
+                 rps=4.0, host_concurrency=8, block='all', block_allow=()):
+        self.worker_id = worker_id
+        self.headless = headless
+        self.fetch = fetch
+        self.http_concurrency = http_concurrency
+        self.max_listings = max_listings
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.exit_when_empty = exit_when_empty
+        self.kinds = kinds
+        self.rps = rps
+        self.host_concurrency = host_concurrency
+        self.block = block
+        self.block_allow = block_allow
+        self.stats = {'done': 0, 'retried': 0, 'dead': 0, 'listings': 0, 'rejected': 0}
+        self.changed_model_ids = set()
+        self.conn = None
+        self._scraper = None
+        self._scraper_car = None
+
+    def scraper_for(self, car):
+        """A BATSeleniumScraper for car; the browser session is kept warm across cars"""
+        if self._scraper_car != car_key(car):
+            from bat_scraper import BATSeleniumScraper
+            if self._scraper:
+                self._scraper.close()
+            self._scraper = BATSeleniumScraper(
+                slugs=car['slugs'],
+                make=car['make'],
+                model_full=car['model_full'],
+                model_short=car['model_short'],
+                min_year=car['min_year'],
+                max_year=car['max_year'],
+                max_listings=self.max_listings,
+                headless=self.headless,
+                session=self.session,
+                fetch=self.fetch,
+                http_concurrency=self.http_concurrency,
+                rate_limiter=self.rate_limiter
+            )
+            self._scraper_car = car_key(car)
+        return self._scraper
+
+    def run_car(self, job):
+        payload = job['payload']
+        car = payload['car']
+        for slug in car['slugs']:
+            enqueue(self.conn, 'slug', {'run': payload['run'], 'car': car, 'slug': slug},
+                    f"{payload['run']}:slug:{car_key(car)}:{slug}", job['max_attempts'])
+
+    def run_slug(self, job):
+        payload = job['payload']
+        scraper = self.scraper_for(payload['car'])
+        url = scraper.base_url + payload['slug'] + "/"
+        cards = scraper.load_model_cards(url, scraper.max_clicks)
+        if not cards:
+            # An empty results page is almost always a failed load
+            raise RuntimeError(f"No listing cards on {url}")
+
+        kept = [card for card in cards if scraper.keep_card(card)][:self.max_listings]
+        for card in kept:
+            enqueue(self.conn, 'detail', {'run': payload['run'], 'car': payload['car'], 'card': card},
+                    f"{payload['run']}:detail:{card['url']}", job['max_attempts'])
+        print(f"  [{self.worker_id}] {payload['slug']}: {len(kept)} detail jobs from {len(cards)} cards")
+
+    def run_detail(self, job):
+        payload = job['payload']
+        card = payload['card']
+        scraper = self.scraper_for(payload['car'])
+        details = scraper.iter_listing_details([card])
+        try:
+            detail_data = next(details, None)
+        finally:
+            details.close()
+        if not detail_data:
+            raise RuntimeError(f"Could not load {card['url']}")
+
+        record = scraper.listing_record(card, detail_data)
+        if detail_data.get('country') and detail_data['country'] != 'USA':
+            self.stats['rejected'] += 1
+            return
+        if not record['vin'] or record['vin'] == 'N/A':
+            self.stats['rejected'] += 1
+            return
+
+        # ingest_batch commits the listing before complete() marks the job done.
+        # A worker that dies in between has the job re-run, which upserts the
+        # same record by url: the row is not duplicated, only found unchanged
+        inserted, updated, unchanged, errors, model_ids = populate_db.ingest_batch(self.conn, [record], self.resolver)
+        if errors:
+            raise RuntimeError(f"Could not write {card['url']} to the database")
+        if unchanged and job['attempts'] > 1:
+            # The earlier attempt may have written it and died before notifying
+            model_ids = [self.resolver.model_id(self.resolver.make_id(record['make']), record['model'])]
+        self.changed_model_ids.update(model_ids)
+        self.stats['listings'] += 1
+
+    def connect(self):
+        self.conn = populate_db.get_db_connection()
+        self.resolver = populate_db.DimensionResolver(self.conn)
+        self.queue = JobQueue(self.conn, self.worker_id, self.lease_seconds)
+
+    def reconnect(self):
+        """Replace a broken connection, retrying with backoff; raises if the database stays unreachable"""
+        close_quietly(self.conn)
+        for attempt in range(RECONNECT_ATTEMPTS):
+            try:
+                self.connect()
+                print(f"[{self.worker_id}] Reconnected to the database")
+                return
+            except Exception as e:
+                if attempt == RECONNECT_ATTEMPTS - 1:
+                    raise
+                print(f"[{self.worker_id}] Reconnect failed, retrying: {e}")
+                time.sleep(min(2 ** attempt, 30))
+
+    def record_failure(self, job, error):
+        """
+        queue.fail() for a job whose handler raised, on a new connection if the
+        old one broke. If it still cannot be recorded the job stays running and
+        is released when its lease expires. Returns the new status or None.
+        """
+        for attempt in range(2):
+            try:
+                if self.conn.closed:
+                    self.reconnect()
+                status = self.queue.fail(job, error)
+            except Exception as e:
+                print(f"[{self.worker_id}] Could not record the failure of job {job['id']}: {e}")
+                continue
+            self.stats['dead' if status == 'dead' else 'retried'] += 1
+            print(f"[{self.worker_id}] {job['kind']} job {job['id']} failed "
+                  f"(attempt {job['attempts']}/{job['max_attempts']}, now {status}): {error}")
+            return status
+        print(f"[{self.worker_id}] Job {job['id']} will be retried once its lease expires")
+        return None
+
+    def idle(self):
+        """No job to claim: notify, reap and wait. True when the worker should exit."""
+        self.notify_changes()
+        released = self.queue.reap_expired()
+        if released:
+            print(f"[{self.worker_id}] Released {released} job(s) with expired leases")
+            return False
+        if self.exit_when_empty and self.queue.outstanding() == 0:
+            return True
+        time.sleep(self.poll_seconds)
+        return False
+
+    def notify_changes(self):
+        if self.changed_model_ids:
+            populate_db.notify_ingest_complete(self.conn, self.changed_model_ids)
+            self.changed_model_ids = set()
+
+    def run(self):
+        from browser import BrowserSession, blocking_profile
+        from ratelimit import RateLimiter
+
+        self.connect()
+        populate_db.require_content_hash_column(self.conn)
+        ensure_queue_table(self.conn)
+        self.session = BrowserSession(
+            headless=self.headless, keep=1, blocking=blocking_profile(self.block, self.block_allow)
+        )
+        self.rate_limiter = RateLimiter(rate=self.rps, concurrency=self.host_concurrency)
+        heartbeat = Heartbeat(self.worker_id, self.lease_seconds, min(HEARTBEAT_SECONDS, self.lease_seconds / 3)).start()
+        handlers = {'car': self.run_car, 'slug': self.run_slug, 'detail': self.run_detail}
+        started = time.perf_counter()
+
+        print(f"[{self.worker_id}] Worker started")
+        try:
+            while not heartbeat.failed:
+                try:
+                    job = self.queue.claim(self.kinds)
+                    if job is None:
+                        if self.idle():
+                            break
+                        continue
+                except Exception as e:
+                    if not self.conn.closed:
+                        raise
+                    print(f"[{self.worker_id}] Database connection lost, reconnecting: {e}")
+                    self.reconnect()
+                    continue
+
+                heartbeat.watch(job['id'])
+                try:
+                    handlers[job['kind']](job)
+                    if self.queue.complete(job['id']):
+                        self.stats['done'] += 1
+                    else:
+                        print(f"[{self.worker_id}] Job {job['id']} was reclaimed by another worker; result discarded")
+                except Exception as e:
+                    self.record_failure(job, e)
+                finally:
+                    heartbeat.watch(None)
+
+            if heartbeat.failed:
+                print(f"[{self.worker_id}] Stopping: leases cannot be kept without heartbeats")
+        finally:
+            heartbeat.close()
+            try:
+                self.notify_changes()
+            except Exception as e:
+                print(f"[{self.worker_id}] Could not send ingest notification: {e}")
+            if self._scraper:
+                self._scraper.close()
+            self.session.close()
+            close_quietly(self.conn)
+
+        elapsed = time.perf_counter() - started
+        print(
+            f"[{self.worker_id}] Finished: {self.stats['done']} jobs done, {self.stats['retried']} retried, "
+            f"{self.stats['dead']} dead, {self.stats['listings']} listings written, "
+            f"{self.stats['rejected']} rejected ({elapsed:.0f}s)"
+        )
+        return self.stats
+
+def run_worker(index, options):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+    return QueueWorker(worker_id, **options).run()
+
+def print_status(conn):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT kind, status, COUNT(*) FROM scrape_jobs
+            GROUP BY kind, status ORDER BY kind, status
+        """)
+        rows = cur.fetchall()
+        cur.execute("""
+            SELECT id, kind, dedupe_key, last_error FROM scrape_jobs
+            WHERE status = 'dead' ORDER BY updated_at DESC LIMIT 10
+        """)
+        dead = cur.fetchall()
+
+    print("="*70)
+    print("SCRAPE QUEUE")
+    print("="*70)
+    for kind, status, count in rows:
+        print(f"  {kind:8} {status:8} {count:6}")
+    if dead:
+        print("\nMost recent dead jobs:")
+        for job_id, kind, key, error in dead:
+            print(f"  {job_id} {kind} {key}: {error}")
+    print()
+
+def main():
+    parser = argparse.ArgumentParser(description='Distributed scraping through a Postgres work queue')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_cmd = subparsers.add_parser('enqueue', help='Add a car job per entry of a cars JSON file')
+    enqueue_cmd.add_argument('--json', required=True, help='Path to JSON file containing array of car objects')
+    enqueue_cmd.add_argument('--run', default=date.today().isoformat(),
+                             help='Run name; jobs are deduplicated within a run (default: today)')
+    enqueue_cmd.add_argument('--max-attempts', type=int, default=5, help='Attempts before a job is dead-lettered')
+
+    work = subparsers.add_parser('work', help='Claim and run jobs')
+    work.add_argument('--workers', type=int, default=1, help='Worker processes on this machine, each with its own browser')
+    work.add_argument('--headless', action='store_true', help='Run in headless mode')
+    work.add_argument('--fetch', choices=['selenium', 'http'], default='selenium', help='Page fetch backend')
+    work.add_argument('--http-concurrency', type=int, default=8, help='With --fetch http, requests in flight per worker')
+    work.add_argument('--max-listings', type=int, default=100, help='Detail jobs per model page')
+    work.add_argument('--lease', type=int, default=LEASE_SECONDS, help='Seconds a claimed job is held without a heartbeat')
+    work.add_argument('--rps', type=float, default=4.0,
+                      help='Most requests per second to one host, per worker process')
+    work.add_argument('--host-concurrency', type=int, default=8, help='Most requests in flight to one host, per worker process')
+    work.add_argument('--block', choices=['off', 'assets', 'all'], default='all', help='Resources browsers do not fetch')
+    work.add_argument('--block-allow', nargs='+', default=[], metavar='PAGE:CATEGORY',
+                      help='Per-page-type exceptions, e.g. detail:images')
+    work.add_argument('--kinds', nargs='+', choices=sorted(PRIORITY), help='Only claim these job kinds')
+    work.add_argument('--exit-when-empty', action='store_true', help='Stop once no jobs are pending or running')
+
+    subparsers.add_parser('status', help='Job counts by kind and status, and recent dead jobs')
+    subparsers.add_parser('retry-dead', help='Put dead jobs back in the queue with fresh attempts')
+
+    args = parser.parse_args()
+
+    if args.command == 'work':
+        options = dict(
+            headless=args.headless,
+            fetch=args.fetch,
+            http_concurrency=args.http_concurrency,
+            max_listings=args.max_listings,
+            lease_seconds=args.lease,
+            exit_when_empty=args.exit_when_empty,
+            kinds=args.kinds,
+            rps=args.rps,
+            host_concurrency=args.host_concurrency,
+            block=args.block,
+            block_allow=args.block_allow
+        )
+        if args.workers == 1:
+            run_worker(0, options)
+            return
+        processes = [
+            multiprocessing.Process(target=run_worker, args=(index, options), name=f"queue-worker-{index}")
+            for index in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return
+
+    conn = populate_db.get_db_connection()
+    try:
+        ensure_queue_table(conn)
+        if args.command == 'enqueue':
+            from scrape import normalize_car_config
+            with open(args.json) as f:
+                cars = [normalize_car_config(car) for car in json.load(f)]
+            added = enqueue_cars(conn, cars, args.run, args.max_attempts)
+            print(f"Enqueued {added} car job(s) for run {args.run} ({len(cars) - added} already queued)")
+        elif args.command == 'status':
+            print_status(conn)
+        elif args.command == 'retry-dead':
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE scrape_jobs
+                    SET status = 'pending', attempts = 0, available_at = NOW(), updated_at = NOW()
+                    WHERE status = 'dead'
+                """)
+                print(f"Requeued {cur.rowcount} dead job(s)")
+            conn.commit()
+    finally:
+        conn.close()
+
+if __name__ == '__main__':
+    main()